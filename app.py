@@ -2,13 +2,18 @@ import streamlit as st
 from dotenv import load_dotenv
 import sys
 import io
+import json
 import re
+import time
 from contextlib import redirect_stdout
 
 # Load environment variables
 load_dotenv()
 
-from coordinator import run_deep_research
+# coordinator defers its heavy imports (smolagents, litellm, MCP, serpapi)
+from coordinator import run_deep_research, start_warm_up
+from usage import UsageTracker
+from run_store import RunStore
 
 # ANSI escape code pattern for stripping colors
 ANSI_ESCAPE = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
@@ -252,6 +257,13 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
+# Run history (SQLite + FTS); one connection helper per server process
+@st.cache_resource(show_spinner=False)
+def _run_store():
+    return RunStore()
+
+run_store = _run_store()
+
 # Sidebar
 with st.sidebar:
     st.markdown("### ⚡ 상태")
@@ -280,9 +292,36 @@ with st.sidebar:
     
     st.markdown("---")
     
+    st.markdown("### 🗂️ 리서치 기록")
+    history_query = st.text_input(
+        "기록 검색",
+        placeholder="검색어 (비우면 최근 기록)",
+        label_visibility="collapsed",
+        key="history_query",
+    )
+    for past_run in run_store.search(history_query, limit=10):
+        run_date = time.strftime("%Y-%m-%d %H:%M", time.localtime(past_run["created_at"]))
+        if st.button(
+            f"{past_run['query'][:40]} · {run_date}",
+            key=f"history_{past_run['id']}",
+            help=past_run["preview"],
+            use_container_width=True,
+        ):
+            st.session_state.history_run_id = past_run["id"]
+
+    st.markdown("---")
+
     st.markdown("### ℹ️ 정보")
     st.caption("복잡한 주제일수록 시간이 더 걸릴 수 있습니다.")
 
+# Warm up heavy dependencies in the background once the page has rendered.
+# cache_resource keeps a single warm-up per server process across reruns.
+@st.cache_resource(show_spinner=False)
+def _warm_up_worker():
+    return start_warm_up()
+
+_warm_up_worker()
+
 # Initialize session state for query input if not exists
 if 'main_query_input' not in st.session_state:
     st.session_state.main_query_input = ""
@@ -412,7 +451,8 @@ if research_button and user_query:
             try:
                 # Ensure we have a fresh line at start
                 sys.stdout.write("Initializing Research Agent...\n")
-                result = run_deep_research(user_query)
+                usage = UsageTracker()
+                result = run_deep_research(user_query, usage=usage, store=run_store)
             finally:
                 sys.stdout = old_stdout
         
@@ -433,12 +473,55 @@ if research_button and user_query:
                     mime="text/markdown",
                     use_container_width=True
                 )
+
+            usage_summary = usage.summary()
+            with st.expander(f"💰 토큰 사용량 및 비용 (${usage_summary['total']['cost_usd']:.4f})"):
+                st.json(usage_summary)
+                st.download_button(
+                    label="📥 사용량 JSON 다운로드",
+                    data=json.dumps(usage_summary, indent=2, ensure_ascii=False),
+                    file_name="research_usage.json",
+                    mime="application/json",
+                )
     
     except Exception as e:
         status_placeholder.error("❌ 오류 발생!")
         st.error(f"리서치 중 오류가 발생했습니다: {str(e)}")
         st.exception(e)
 
+# Past run selected from the history panel (loaded from the store, no LLM calls)
+elif st.session_state.get("history_run_id"):
+    past_run = run_store.get(st.session_state.history_run_id)
+    if past_run is None:
+        del st.session_state.history_run_id
+    else:
+        run_date = time.strftime("%Y-%m-%d %H:%M", time.localtime(past_run["created_at"]))
+        st.markdown("---")
+        st.markdown(f"### 🗂️ 저장된 리서치 결과 · {run_date}")
+        st.caption(past_run["query"])
+        st.markdown(past_run["final_report"])
+
+        with st.expander("📋 하위 작업 보고서"):
+            for subtask in past_run.get("subtasks", []):
+                report = past_run.get("subtask_reports", {}).get(subtask["id"])
+                if report:
+                    st.markdown(f"#### {subtask['title']}")
+                    st.markdown(report)
+
+        with st.expander(f"🔗 출처 ({len(past_run.get('sources', []))})"):
+            for source in past_run.get("sources", []):
+                st.markdown(f"- [{source['title'] or source['url']}]({source['url']})")
+
+        with st.expander("⏱️ 실행 정보"):
+            st.json({"timings": past_run.get("timings"), "usage": past_run.get("usage")})
+
+        st.download_button(
+            label="📥 마크다운으로 다운로드",
+            data=past_run["final_report"],
+            file_name="research_result.md",
+            mime="text/markdown",
+        )
+
 # Footer
 st.markdown("---")
 st.markdown("""
@@ -0,0 +1,343 @@
+"""
+Benchmark tooling for the deep research pipeline.
+
+Usage:
+    python benchmark.py import-time [--module coordinator] [--repeat 5] [--top 15]
+    python benchmark.py import-time --save baseline.json
+    python benchmark.py import-time --baseline baseline.json --max-regression 0.2
+    python benchmark.py warm-up [--repeat 3]
+    python benchmark.py memory [--steps 15] [--observation-chars 12000] [--task-chars 4400] [--context-tokens 128000]
+    python benchmark.py replay --cassette research_cassette.jsonl.gz [--latency zero] [--profile run.prof]
+
+Record a cassette for `replay` with CASSETTE_MODE=record (see cassette.py).
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from types import SimpleNamespace
+
+# "import time:      1234 |       5678 |   package.module"
+IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def parse_import_time(stderr: str) -> dict:
+    """
+    Parse the output of `python -X importtime`.
+
+    Returns:
+        Dict mapping module name to cumulative import time in microseconds
+    """
+    cumulative = {}
+    for line in stderr.splitlines():
+        m = IMPORT_TIME_LINE.match(line)
+        if m:
+            cumulative[m.group(4)] = int(m.group(2))
+    return cumulative
+
+
+def measure_import_time(statement: str) -> dict:
+    """
+    Run `statement` in a fresh interpreter with `-X importtime`.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"`{statement}` failed:\n{proc.stderr[-2000:]}")
+    return parse_import_time(proc.stderr)
+
+
+def bench_import_time(args) -> dict:
+    runs = [measure_import_time(f"import {args.module}") for _ in range(args.repeat)]
+
+    totals = [r.get(args.module, 0) for r in runs]
+    modules = set().union(*runs)
+    medians = {
+        name: statistics.median(r.get(name, 0) for r in runs) for name in modules
+    }
+    # Only top-level packages, so nested modules are not double counted
+    top_level = sorted(
+        ((name, t) for name, t in medians.items() if "." not in name and name != args.module),
+        key=lambda item: item[1],
+        reverse=True,
+    )[: args.top]
+
+    result = {
+        "module": args.module,
+        "repeat": args.repeat,
+        "total_us_median": statistics.median(totals),
+        "total_us_min": min(totals),
+        "modules_imported": len(modules),
+        "top_imports_us": dict(top_level),
+    }
+
+    print(f"\033[93mImport time for `{args.module}` ({args.repeat} runs)\033[0m")
+    print(f"median: {result['total_us_median'] / 1000:.1f} ms, "
+          f"min: {result['total_us_min'] / 1000:.1f} ms, "
+          f"modules: {result['modules_imported']}")
+    for name, t in top_level:
+        print(f"  {t / 1000:8.1f} ms  {name}")
+    return result
+
+
+def bench_warm_up(args) -> dict:
+    """
+    Time coordinator.warm_up() (heavy imports + client construction) in fresh interpreters.
+    """
+    statement = "import coordinator; print(coordinator.warm_up())"
+    timings = []
+    for _ in range(args.repeat):
+        proc = subprocess.run(
+            [sys.executable, "-c", statement],
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"warm-up failed:\n{proc.stderr[-2000:]}")
+        timings.append(float(proc.stdout.strip().splitlines()[-1]))
+
+    result = {
+        "repeat": args.repeat,
+        "warm_up_s_median": statistics.median(timings),
+        "warm_up_s_min": min(timings),
+    }
+    print(f"\033[93mWarm-up time ({args.repeat} runs)\033[0m")
+    print(f"median: {result['warm_up_s_median']:.2f} s, min: {result['warm_up_s_min']:.2f} s")
+    return result
+
+
+def simulate_subagent_prompts(steps: int, observation_chars: int, policy=None, task_chars: int = 4400) -> list:
+    """
+    Replay a synthetic sub-agent run (alternating search / scrape observations)
+    and return the estimated prompt tokens sent at each step. `task_chars`
+    models long upstream reports in the task.
+    """
+    from subagent_memory import SubagentMemoryPolicy
+
+    search = json.dumps(
+        [{"title": f"Result {i}", "link": f"https://example.com/{i}", "snippet": "lorem ipsum " * 20}
+         for i in range(10)],
+        indent=2,
+    )
+    sentence = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. "
+    page = (sentence * (observation_chars // len(sentence) + 1))[:observation_chars]
+
+    memory = SimpleNamespace(
+        system_prompt=SimpleNamespace(system_prompt="x" * 8000),
+        steps=[SimpleNamespace(task=("Research the subtask. " * (task_chars // 22 + 1))[:task_chars])],
+    )
+    prompts = []
+    for n in range(1, steps + 1):
+        prompts.append(SubagentMemoryPolicy._prompt_tokens(memory))
+        memory.steps.append(SimpleNamespace(
+            step_number=n,
+            model_output="Thinking about which source to read next. " * 10,
+            tool_calls=[SimpleNamespace(arguments={"query": f"query {n}"})],
+            observations=search if n % 2 else page,
+            error=None,
+        ))
+        if policy is not None:
+            policy.apply(memory)
+    return prompts
+
+
+def bench_memory(args) -> dict:
+    from subagent_memory import SubagentMemoryPolicy
+
+    unbounded = simulate_subagent_prompts(args.steps, args.observation_chars, task_chars=args.task_chars)
+    policy = SubagentMemoryPolicy()
+    bounded = simulate_subagent_prompts(args.steps, args.observation_chars, policy, args.task_chars)
+
+    def steps_until_overflow(prompts):
+        # Number of steps that fit before a prompt exceeds the model context
+        return next((n for n, t in enumerate(prompts) if t > args.context_tokens), len(prompts))
+
+    def steps_within_budget(prompts):
+        # Number of steps affordable with the input-token budget of the unbounded run
+        total, budget = 0, sum(unbounded)
+        for n, t in enumerate(prompts):
+            total += t
+            if total > budget:
+                return n
+        return len(prompts)
+
+    result = {
+        "steps": args.steps,
+        "observation_chars": args.observation_chars,
+        "task_chars": args.task_chars,
+        "window": policy.window,
+        "max_prompt_tokens_cap": policy.max_prompt_tokens,
+        "unbounded_total_tokens": sum(unbounded),
+        "unbounded_max_tokens": max(unbounded),
+        "bounded_total_tokens": sum(bounded),
+        "bounded_max_tokens": max(bounded),
+        "context_tokens": args.context_tokens,
+        "unbounded_steps_before_overflow": steps_until_overflow(unbounded),
+        "bounded_steps_before_overflow": steps_until_overflow(bounded),
+        "bounded_steps_at_unbounded_cost": steps_within_budget(
+            simulate_subagent_prompts(args.steps * 10, args.observation_chars, SubagentMemoryPolicy(),
+                                      args.task_chars)
+        ),
+        "truncated_observations": policy.summary()["truncated_observations"],
+        "task_truncated": policy.task_truncated,
+        "cap_overruns": policy.cap_overruns,
+    }
+    print(f"\033[93mSub-agent prompt growth over {args.steps} steps\033[0m")
+    print(f"{'step':>4} {'unbounded':>10} {'bounded':>10}")
+    for n, (u, b) in enumerate(zip(unbounded, bounded), 1):
+        print(f"{n:>4} {u:>10} {b:>10}")
+    print(f"total: {result['unbounded_total_tokens']} -> {result['bounded_total_tokens']} tokens")
+    print(f"steps before exceeding a {args.context_tokens}-token context: "
+          f"{result['unbounded_steps_before_overflow']} -> {result['bounded_steps_before_overflow']} "
+          f"(of {args.steps} simulated)")
+    print(f"steps affordable for the unbounded run's tokens: "
+          f"{args.steps} -> {result['bounded_steps_at_unbounded_cost']}")
+    return result
+
+
+def bench_replay(args) -> dict:
+    """
+    Replay a recorded run offline and measure wall time, CPU time and peak
+    memory of our own code (external calls are served from the cassette).
+    """
+    import contextlib
+    import cProfile
+    import io
+    import pstats
+    import time
+    import tracemalloc
+
+    # The cassette is configured from the environment on first use
+    os.environ["CASSETTE_MODE"] = "replay"
+    os.environ["CASSETTE_PATH"] = args.cassette
+    os.environ["CASSETTE_LATENCY"] = args.latency
+
+    import coordinator
+    from cassette import get_cassette
+    from run_store import extract_sources
+    from usage import UsageTracker
+
+    query = args.query or get_cassette().meta.get("query")
+    if not query:
+        raise SystemExit("The cassette has no recorded query; pass --query")
+
+    profiler = cProfile.Profile() if args.profile else None
+    tracemalloc.start()
+    wall, cpu = time.perf_counter(), time.process_time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if profiler:
+            profiler.enable()
+        usage = UsageTracker()
+        final_report = coordinator.run_deep_research(query, usage=usage)
+        if profiler:
+            profiler.disable()
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {
+        "cassette": args.cassette,
+        "latency": args.latency,
+        "wall_s": round(wall, 4),
+        "cpu_s": round(cpu, 4),
+        "peak_memory_mb": round(peak / 1e6, 2),
+        "interactions": len(get_cassette().entries),
+        "cassette_misses": get_cassette().misses,
+        # Effect of the sub-agent memory policy on step count and report
+        "subagent_steps": {
+            agent: g["calls"] for agent, g in usage.summary()["by_agent"].items() if agent.startswith("subagent")
+        },
+        "subagent_input_tokens": usage.summary()["by_stage"].get("subagent", {}).get("input_tokens", 0),
+        "final_report_chars": len(final_report or ""),
+        "final_report_sources": len(extract_sources(final_report or "")),
+    }
+    print(f"\033[93mReplay of {args.cassette} ({args.latency} latency)\033[0m")
+    print(f"wall: {result['wall_s']:.3f} s, cpu: {result['cpu_s']:.3f} s, "
+          f"peak memory: {result['peak_memory_mb']:.1f} MB, misses: {result['cassette_misses']}")
+    print(f"sub-agent steps: {result['subagent_steps']}, sub-agent input tokens: "
+          f"{result['subagent_input_tokens']}, report sources: {result['final_report_sources']}")
+
+    if profiler:
+        profiler.dump_stats(args.profile)
+        stats = io.StringIO()
+        pstats.Stats(profiler, stream=stats).sort_stats("cumulative").print_stats(20)
+        print(stats.getvalue())
+        print(f"Profile saved to {args.profile}")
+    return result
+
+
+def compare_to_baseline(result: dict, baseline_path: str, key: str, max_regression: float) -> bool:
+    """
+    Compare `result[key]` to the same key in a saved baseline.
+
+    Returns:
+        True if the regression is within `max_regression` (a ratio, e.g. 0.2 = 20%)
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    before, after = baseline[key], result[key]
+    change = (after - before) / before if before else 0.0
+    print(f"{key}: {before} -> {after} ({change:+.1%})")
+    if change > max_regression:
+        print(f"\033[91mRegression above {max_regression:.0%} threshold\033[0m")
+        return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deep research benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("import-time", help="Measure module import time with -X importtime")
+    p.add_argument("--module", default="coordinator")
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--top", type=int, default=15)
+    p.set_defaults(func=bench_import_time, compare_key="total_us_median")
+
+    p = sub.add_parser("warm-up", help="Measure the background warm-up cost")
+    p.add_argument("--repeat", type=int, default=3)
+    p.set_defaults(func=bench_warm_up, compare_key="warm_up_s_median")
+
+    p = sub.add_parser("memory", help="Simulate sub-agent prompt growth with and without the memory policy")
+    p.add_argument("--steps", type=int, default=15)
+    p.add_argument("--observation-chars", type=int, default=12000)
+    p.add_argument("--task-chars", type=int, default=4400)
+    p.add_argument("--context-tokens", type=int, default=128000)
+    p.set_defaults(func=bench_memory, compare_key="bounded_total_tokens")
+
+    p = sub.add_parser("replay", help="Profile a recorded run offline from a cassette")
+    p.add_argument("--cassette", required=True)
+    p.add_argument("--latency", choices=["zero", "recorded"], default="zero")
+    p.add_argument("--query", help="Defaults to the query stored in the cassette")
+    p.add_argument("--profile", help="Write cProfile stats to this path")
+    p.set_defaults(func=bench_replay, compare_key="cpu_s")
+
+    for p in sub.choices.values():
+        p.add_argument("--save", help="Write the result as JSON to this path")
+        p.add_argument("--baseline", help="Compare against a previously saved JSON result")
+        p.add_argument("--max-regression", type=float, default=0.2)
+
+    args = parser.parse_args()
+    result = args.func(args)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"Benchmark result saved to {args.save}")
+
+    if args.baseline and not compare_to_baseline(
+        result, args.baseline, args.compare_key, args.max_regression
+    ):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Two-tier model cascade for research sub-agents.
+
+Most sub-agent steps only pick the next tool call (a search query, a URL to
+scrape); the expensive part is the final report. CascadeModel sends every step
+to a small, fast model first and escalates to the large model only when:
+
+- the fast model wants to give the final answer (the report is written by the
+  large model instead),
+- the call has no tools to choose from (e.g. a forced final answer),
+- the fast output fails validation: no tool call, an unknown tool, arguments
+  that are not a JSON object or miss a required input,
+- the fast model call raises.
+
+Every call is recorded in the run's UsageTracker with its tier and latency,
+including fast outputs that were thrown away on escalation.
+"""
+import json
+import time
+
+FAST = "fast"
+STRONG = "strong"
+FINAL_ANSWER_TOOL = "final_answer"
+
+
+def _tool_calls(message, parse):
+    """
+    Tool calls of `message`, parsing them from its text if needed (raises when
+    there are none).
+    """
+    if not message.tool_calls:
+        message = parse(message)
+    calls = []
+    for tc in message.tool_calls:
+        arguments = tc.function.arguments
+        if isinstance(arguments, str):
+            arguments = json.loads(arguments) if arguments.strip() else {}
+        calls.append((tc.function.name, arguments))
+    return message, calls
+
+
+def validation_error(message, tools: list, parse) -> str:
+    """
+    Return why a fast-model tool-calling output is unusable, or "" if it is valid.
+    """
+    try:
+        message, calls = _tool_calls(message, parse)
+    except Exception as e:
+        return f"unparsable tool call ({type(e).__name__})"
+    if not calls:
+        return "no tool call"
+
+    by_name = {t.name: t for t in tools}
+    for name, arguments in calls:
+        tool = by_name.get(name)
+        if tool is None:
+            return f"unknown tool {name!r}"
+        if not isinstance(arguments, dict):
+            # Single-input tools also accept a bare value
+            if len(tool.inputs) == 1:
+                continue
+            return f"arguments of {name!r} are not an object"
+        missing = [
+            key for key, spec in tool.inputs.items()
+            if not spec.get("nullable") and key not in arguments
+        ]
+        if missing:
+            return f"{name!r} is missing {', '.join(missing)}"
+    return ""
+
+
+def escalation_kind(problem: str) -> str:
+    if problem == "final answer":
+        return "final_answer"
+    if problem.startswith("error"):
+        return "error"
+    return "invalid_output"
+
+
+class CascadeModel:
+    """
+    smolagents-compatible model that routes each generation to a fast or a
+    strong model. Other attributes are those of the strong model.
+
+        model = CascadeModel(fast_model, strong_model, usage=usage, agent_name=name)
+        agent = ToolCallingAgent(tools=tools, model=model, ...)
+    """
+
+    def __init__(self, fast, strong, usage=None, agent_name: str = "subagent", stage: str = "subagent"):
+        self.fast = fast
+        self.strong = strong
+        self.usage = usage
+        self.agent_name = agent_name
+        self.stage = stage
+        self.escalations = {}
+
+    def __getattr__(self, name):
+        # Only called for attributes not found on the cascade itself
+        return getattr(self.strong, name)
+
+    @property
+    def model_id(self) -> str:
+        return f"cascade({self.fast.model_id}->{self.strong.model_id})"
+
+    def _call(self, tier: str, messages, **kwargs):
+        """
+        Generate with the model of `tier` and record the call; returns the
+        message (None if the fast call raised) and the validation problem.
+        """
+        model = self.fast if tier == FAST else self.strong
+        start = time.perf_counter()
+        message, problem = None, ""
+        try:
+            message = model.generate(messages, **kwargs)
+        except Exception as e:
+            if tier == STRONG:
+                raise
+            problem = f"error: {type(e).__name__}"
+        latency = time.perf_counter() - start
+
+        tools = kwargs.get("tools_to_call_from")
+        if tier == FAST and message is not None:
+            problem = validation_error(message, tools, self.fast.parse_tool_calls)
+            if not problem and any(name == FINAL_ANSWER_TOOL
+                                   for name, _ in _tool_calls(message, self.fast.parse_tool_calls)[1]):
+                problem = "final answer"
+
+        if self.usage is not None:
+            token_usage = getattr(message, "token_usage", None)
+            self.usage.record(
+                self.stage,
+                self.agent_name,
+                model.model_id,
+                token_usage.input_tokens if token_usage is not None else 0,
+                token_usage.output_tokens if token_usage is not None else 0,
+                tier=tier,
+                latency_s=latency,
+                escalated=escalation_kind(problem) if problem else None,
+            )
+        return message, problem
+
+    def _escalate(self, kind: str, reason: str):
+        self.escalations[kind] = self.escalations.get(kind, 0) + 1
+        print(f"{self.agent_name}: escalating to {self.strong.model_id} ({reason})")
+
+    def generate(self, messages, stop_sequences=None, response_format=None, tools_to_call_from=None, **kwargs):
+        kwargs.update(stop_sequences=stop_sequences, response_format=response_format,
+                      tools_to_call_from=tools_to_call_from)
+        if not tools_to_call_from:
+            self._escalate("no_tools", "no tools to call")
+        else:
+            message, problem = self._call(FAST, messages, **kwargs)
+            if not problem:
+                return message
+            self._escalate(escalation_kind(problem), problem)
+
+        message, _ = self._call(STRONG, messages, **kwargs)
+        return message
+
+    def __call__(self, *args, **kwargs):
+        return self.generate(*args, **kwargs)
+
+    def summary(self) -> dict:
+        return {"fast": self.fast.model_id, "strong": self.strong.model_id, "escalations": dict(self.escalations)}
@@ -0,0 +1,334 @@
+"""
+Record / replay of all external I/O of a research run.
+
+A run talks to three external systems: the OpenAI-compatible LLM endpoints
+(planner, task splitter, coordinator and sub-agent models), SerpAPI, and the
+scraping MCP server. In "record" mode every request/response pair is captured
+together with its original latency into a gzip-compressed JSONL cassette. In
+"replay" mode responses are served from the cassette (at the recorded latency
+or at zero latency) and no network access happens, so CPU, memory and
+orchestration overhead can be profiled and compared across versions offline.
+
+Requests are matched by a hash of their content; if a request is not found
+(e.g. because a prompt template changed), the next unused recording of the same
+kind and scope is served instead and a warning is printed.
+"""
+import dataclasses
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+# Cassette configuration via environment variables
+CASSETTE_MODE = os.environ.get("CASSETTE_MODE", "off")  # off | record | replay
+CASSETTE_PATH = os.environ.get("CASSETTE_PATH", "research_cassette.jsonl.gz")
+CASSETTE_LATENCY = os.environ.get("CASSETTE_LATENCY", "recorded")  # recorded | zero
+
+CASSETTE_VERSION = 1
+
+
+class CassetteMiss(LookupError):
+    """Raised in replay mode when no recording is left for a request."""
+
+
+def _jsonable(obj):
+    # ChatMessage & co. are dataclasses; the raw provider response is not
+    # reproducible and token usage is not part of the request
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return {
+            f.name: _jsonable(getattr(obj, f.name))
+            for f in dataclasses.fields(obj)
+            if f.name not in ("raw", "token_usage")
+        }
+    if isinstance(obj, dict):
+        return {str(k): _jsonable(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_jsonable(v) for v in obj]
+    if hasattr(obj, "value") and isinstance(getattr(obj, "value"), str):  # enums
+        return obj.value
+    if isinstance(obj, (str, int, float, bool)) or obj is None:
+        return obj
+    return str(obj)
+
+
+def request_key(kind: str, request) -> str:
+    payload = json.dumps([kind, _jsonable(request)], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+# ---- ChatMessage (de)serialization --------------------------------------------
+def encode_chat_message(message) -> dict:
+    token_usage = getattr(message, "token_usage", None)
+    return {
+        "role": _jsonable(message.role),
+        "content": _jsonable(message.content),
+        "tool_calls": [
+            {
+                "id": tc.id,
+                "type": tc.type,
+                "function": {"name": tc.function.name, "arguments": _jsonable(tc.function.arguments)},
+            }
+            for tc in (message.tool_calls or [])
+        ] or None,
+        "token_usage": {
+            "input_tokens": token_usage.input_tokens,
+            "output_tokens": token_usage.output_tokens,
+        } if token_usage is not None else None,
+    }
+
+
+def decode_chat_message(data: dict):
+    from smolagents.models import (
+        ChatMessage,
+        ChatMessageToolCall,
+        ChatMessageToolCallFunction,
+        MessageRole,
+    )
+    from smolagents.monitoring import TokenUsage
+
+    tool_calls = None
+    if data.get("tool_calls"):
+        tool_calls = [
+            ChatMessageToolCall(
+                id=tc["id"],
+                type=tc["type"],
+                function=ChatMessageToolCallFunction(
+                    name=tc["function"]["name"], arguments=tc["function"]["arguments"]
+                ),
+            )
+            for tc in data["tool_calls"]
+        ]
+    token_usage = TokenUsage(**data["token_usage"]) if data.get("token_usage") else None
+    return ChatMessage(
+        role=MessageRole(data["role"]),
+        content=data["content"],
+        tool_calls=tool_calls,
+        token_usage=token_usage,
+    )
+
+
+class Cassette:
+    """
+    Recording/replaying proxy for external calls. A no-op when mode is "off".
+    """
+
+    def __init__(self, path: str = CASSETTE_PATH, mode: str = CASSETTE_MODE,
+                 latency: str = CASSETTE_LATENCY):
+        if mode not in ("off", "record", "replay"):
+            raise ValueError(f"Unknown CASSETTE_MODE {mode!r}")
+        if latency not in ("recorded", "zero"):
+            raise ValueError(f"Unknown CASSETTE_LATENCY {latency!r}")
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.meta = {}
+        self.entries = []
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        self._by_key = defaultdict(deque)
+        self._by_scope = defaultdict(deque)
+        if self.replaying:
+            self.load()
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    # ---- core ----------------------------------------------------------------
+    def call(self, kind: str, request, fn, scope: str = "", encode=None, decode=None):
+        """
+        Perform `fn()` (record/off) or serve its recorded response (replay).
+
+        Args:
+            kind: Category of external call, e.g. "llm", "serpapi", "mcp_tool"
+            request: JSON-able description of the request; its hash is the match key
+            fn: Zero-argument callable that performs the real call
+            scope: Finer grouping used when the exact request is not found (agent or tool name)
+            encode / decode: Convert the response to / from its JSON form
+        """
+        if self.mode == "off":
+            return fn()
+
+        key = request_key(kind, request)
+        if self.replaying:
+            entry = self._take(kind, scope, key)
+            if self.latency == "recorded" and entry["elapsed"]:
+                time.sleep(entry["elapsed"])
+            if "error" in entry:
+                raise RuntimeError(f"[replayed] {entry['error']}")
+            response = entry["response"]
+            return decode(response) if decode else response
+
+        start = time.perf_counter()
+        entry = {"kind": kind, "scope": scope, "key": key, "t": round(start - self._started, 4)}
+        try:
+            response = fn()
+        except Exception as e:
+            entry["elapsed"] = round(time.perf_counter() - start, 4)
+            entry["error"] = f"{type(e).__name__}: {e}"
+            self._append(entry)
+            raise
+        entry["elapsed"] = round(time.perf_counter() - start, 4)
+        entry["response"] = _jsonable(encode(response) if encode else response)
+        self._append(entry)
+        return response
+
+    def _append(self, entry: dict):
+        with self._lock:
+            self.entries.append(entry)
+
+    def _take(self, kind: str, scope: str, key: str) -> dict:
+        with self._lock:
+            for queue in (self._by_key[(kind, key)], self._by_scope[(kind, scope)]):
+                while queue:
+                    entry = queue.popleft()
+                    if not entry.get("_used"):
+                        if queue is self._by_scope[(kind, scope)]:
+                            self.misses += 1
+                            print(f"\033[91mCassette: no exact match for {kind} {scope!r}, "
+                                  f"serving next recording in order\033[0m")
+                        entry["_used"] = True
+                        return entry
+        raise CassetteMiss(f"No recording left for {kind} {scope!r} (key {key})")
+
+    def drain(self) -> list:
+        """
+        Return the recorded entries and forget them, except tool specs (also
+        returned), which a process records only once. Used by queue workers to
+        hand their recordings to the dispatching process.
+        """
+        with self._lock:
+            entries = self.entries
+            self.entries = [e for e in entries if e["kind"] == "tool_specs"]
+        return entries
+
+    def merge(self, entries: list):
+        """Add entries recorded by another process, skipping tool specs already present."""
+        with self._lock:
+            known = {e["key"] for e in self.entries if e["kind"] == "tool_specs"}
+            for entry in entries:
+                if entry["kind"] == "tool_specs":
+                    if entry["key"] in known:
+                        continue
+                    known.add(entry["key"])
+                self.entries.append(entry)
+
+    # ---- persistence -----------------------------------------------------------
+    def load(self):
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            if header.get("version") != CASSETTE_VERSION:
+                raise ValueError(f"Unsupported cassette version {header.get('version')}")
+            self.meta = header.get("meta", {})
+            self.entries = [json.loads(line) for line in f if line.strip()]
+        for entry in self.entries:
+            self._by_key[(entry["kind"], entry["key"])].append(entry)
+            self._by_scope[(entry["kind"], entry["scope"])].append(entry)
+
+    def save(self):
+        if not self.recording:
+            return
+        with self._lock:
+            entries = list(self.entries)
+        with gzip.open(self.path, "wt", encoding="utf-8") as f:
+            f.write(json.dumps({"version": CASSETTE_VERSION, "meta": self.meta}) + "\n")
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+        print(f"Cassette saved to {self.path} ({len(entries)} interactions)")
+
+    # ---- adapters ----------------------------------------------------------------
+    def wrap_model(self, model):
+        """
+        Route `model.generate` (smolagents Model) through the cassette.
+        """
+        if self.mode == "off":
+            return model
+        generate = model.generate
+
+        def cassette_generate(messages, stop_sequences=None, response_format=None,
+                              tools_to_call_from=None, **kwargs):
+            request = {
+                "model": model.model_id,
+                "messages": messages,
+                "stop_sequences": stop_sequences,
+                "response_format": response_format,
+                "tools": [t.name for t in tools_to_call_from or []],
+            }
+            return self.call(
+                "llm",
+                request,
+                lambda: generate(messages, stop_sequences=stop_sequences, response_format=response_format,
+                                 tools_to_call_from=tools_to_call_from, **kwargs),
+                scope=model.model_id,
+                encode=encode_chat_message,
+                decode=decode_chat_message,
+            )
+
+        model.generate = cassette_generate
+        return model
+
+    def wrap_tools(self, scope: str, tools: list) -> list:
+        """
+        Record the specs of `tools` and route their calls through the cassette.
+        """
+        if self.mode == "off":
+            return tools
+        specs = [
+            {"name": t.name, "description": t.description, "inputs": t.inputs, "output_type": t.output_type}
+            for t in tools
+        ]
+        self.call("tool_specs", {"scope": scope}, lambda: specs, scope=scope)
+        by_name = {t.name: t for t in tools}
+        return [self._make_tool(spec, scope, by_name[spec["name"]]) for spec in specs]
+
+    def replay_tools(self, scope: str) -> list:
+        """
+        Rebuild the tools recorded by `wrap_tools` without connecting to anything.
+        """
+        specs = self.call("tool_specs", {"scope": scope}, None, scope=scope)
+        return [self._make_tool(spec, scope, None) for spec in specs]
+
+    def _make_tool(self, spec: dict, scope: str, real_tool):
+        from smolagents import Tool
+
+        cassette = self
+
+        class CassetteTool(Tool):
+            name = spec["name"]
+            description = spec["description"]
+            inputs = spec["inputs"]
+            output_type = spec["output_type"]
+            skip_forward_signature_validation = True
+
+            def forward(self, *args, **kwargs):
+                return cassette.call(
+                    "mcp_tool",
+                    {"scope": scope, "name": spec["name"], "args": args, "kwargs": kwargs},
+                    lambda: real_tool(*args, **kwargs),
+                    scope=spec["name"],
+                )
+
+        return CassetteTool()
+
+
+_cassette = None
+_cassette_lock = threading.Lock()
+
+
+def get_cassette() -> Cassette:
+    """
+    Process-wide cassette configured from CASSETTE_MODE / CASSETTE_PATH / CASSETTE_LATENCY.
+    """
+    global _cassette
+    with _cassette_lock:
+        if _cassette is None:
+            _cassette = Cassette()
+        return _cassette
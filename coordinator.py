@@ -1,22 +1,176 @@
-from planner import generate_research_plan
-from task_splitter import split_into_subtasks
-from prompts import SUBAGENT_PROMPT_TEMPLATE, COORDINATOR_PROMPT_TEMPLATE
-from smolagents import LiteLLMModel, ToolCallingAgent, MCPClient, tool
-from serpapi import GoogleSearch
+from prompts import (
+    SUBAGENT_PROMPT_TEMPLATE,
+    COORDINATOR_PROMPT_TEMPLATE,
+    UPSTREAM_REPORTS_TEMPLATE,
+    UPSTREAM_REPORT_TEMPLATE,
+)
+from scheduler import SUBTASK_MAX_WORKERS, SubtaskScheduler
+from subagent_memory import SubagentMemoryPolicy
+from usage import UsageTracker, BUDGET_OK, BUDGET_EXHAUSTED
+from run_store import RunStore, extract_sources
+from cassette import get_cassette
+from job_queue import get_dispatcher
+from prefetch import Prefetcher, find_scrape_tool
+from ranking import ResultRanker
+from cascade import CascadeModel
+from scraper import build_native_scrape_tool
 import os
 import json
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+# NOTE: smolagents, litellm, openai, serpapi and the MCP client are imported
+# lazily (inside the functions that need them) so that importing this module
+# stays cheap. Use warm_up() / start_warm_up() to pay that cost ahead of time.
 
 # SerpAPI configuration
 SERP_API_KEY = os.environ.get("SERP_API_KEY")
 
 # Scraping MCP configuration
-SCRAPING_MCP_URL = "http://localhost:8000/mcp/"
+SCRAPING_MCP_URL = os.environ.get("SCRAPING_MCP_URL", "http://localhost:8000/mcp/")
+# Page scraping backend: "mcp" (Scraping MCP server), "native" (in-process
+# scraper, MCP only as fallback for JavaScript pages) or "both" (native tool
+# plus all MCP tools)
+SCRAPER_BACKEND = os.environ.get("SCRAPER_BACKEND", "mcp")
 
 # Models configured via environment variables
 COORDINATOR_LLM_URL = os.environ.get("COORDINATOR_LLM_URL", "https://api.openai.com/v1")
 COORDINATOR_MODEL = os.environ.get("COORDINATOR_MODEL", "gpt-4o")
 SUBAGENT_LLM_URL = os.environ.get("SUBAGENT_LLM_URL", "https://api.openai.com/v1")
 SUBAGENT_MODEL = os.environ.get("SUBAGENT_MODEL", "gpt-4o")
+# Small, fast model for routine sub-agent steps (see cascade.py); off when not set
+SUBAGENT_FAST_LLM_URL = os.environ.get("SUBAGENT_FAST_LLM_URL", SUBAGENT_LLM_URL)
+SUBAGENT_FAST_MODEL = os.environ.get("SUBAGENT_FAST_MODEL")
+# Cheaper sub-agent model used once the run budget passes its soft limit
+BUDGET_FALLBACK_LLM_URL = os.environ.get("BUDGET_FALLBACK_LLM_URL", SUBAGENT_LLM_URL)
+BUDGET_FALLBACK_MODEL = os.environ.get("BUDGET_FALLBACK_MODEL")
+
+# Sub-agent execution: "threads" (in this process) or "queue" (worker processes, see job_queue.py)
+SUBAGENT_EXECUTION = os.environ.get("SUBAGENT_EXECUTION", "threads")
+
+# Modules that dominate start-up time; imported by warm_up()
+HEAVY_MODULES = (
+    "openai",
+    "litellm",
+    "smolagents",
+    "mcp",
+    "serpapi",
+    "httpx",
+    "task_splitter",
+)
+
+_models_lock = threading.Lock()
+_models = None
+_budget_model = None
+_fast_model = None
+_warm_up_lock = threading.Lock()
+_warm_up_thread = None
+
+
+def get_models():
+    """
+    Return the (coordinator_model, subagent_model) pair, building it on first use.
+
+    The models are cached for the lifetime of the process so that a warm-up
+    run (or a previous research run) is reused by later runs.
+    """
+    global _models
+    with _models_lock:
+        if _models is None:
+            from smolagents import LiteLLMModel
+
+            coordinator_model = LiteLLMModel(
+                model_id=f"openai/{COORDINATOR_MODEL}",
+                api_key=os.environ.get("OPENAI_API_KEY"),
+                api_base=COORDINATOR_LLM_URL,
+            )
+            subagent_model = LiteLLMModel(
+                model_id=f"openai/{SUBAGENT_MODEL}",
+                api_key=os.environ.get("OPENAI_API_KEY"),
+                api_base=SUBAGENT_LLM_URL,
+            )
+            # Record/replay LLM traffic when a cassette is active
+            cassette = get_cassette()
+            _models = (cassette.wrap_model(coordinator_model), cassette.wrap_model(subagent_model))
+        return _models
+
+
+def get_budget_model():
+    """
+    Return the cheaper sub-agent model (BUDGET_FALLBACK_MODEL), or None if not configured.
+    """
+    global _budget_model
+    if not BUDGET_FALLBACK_MODEL:
+        return None
+    with _models_lock:
+        if _budget_model is None:
+            from smolagents import LiteLLMModel
+
+            _budget_model = get_cassette().wrap_model(LiteLLMModel(
+                model_id=f"openai/{BUDGET_FALLBACK_MODEL}",
+                api_key=os.environ.get("OPENAI_API_KEY"),
+                api_base=BUDGET_FALLBACK_LLM_URL,
+            ))
+        return _budget_model
+
+
+def get_fast_model():
+    """
+    Return the fast sub-agent model of the cascade (SUBAGENT_FAST_MODEL), or None if not configured.
+    """
+    global _fast_model
+    if not SUBAGENT_FAST_MODEL:
+        return None
+    with _models_lock:
+        if _fast_model is None:
+            from smolagents import LiteLLMModel
+
+            _fast_model = get_cassette().wrap_model(LiteLLMModel(
+                model_id=f"openai/{SUBAGENT_FAST_MODEL}",
+                api_key=os.environ.get("OPENAI_API_KEY"),
+                api_base=SUBAGENT_FAST_LLM_URL,
+            ))
+        return _fast_model
+
+
+def warm_up() -> float:
+    """
+    Import the heavy dependencies and build the LLM clients.
+
+    Safe to call from a background thread and more than once; modules that
+    are not installed are skipped.
+
+    Returns:
+        Elapsed time in seconds
+    """
+    import importlib
+
+    start = time.perf_counter()
+    for name in HEAVY_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            print(f"\033[91mWarm-up: could not import {name}: {e}\033[0m")
+    try:
+        get_models()
+    except Exception as e:
+        print(f"\033[91mWarm-up: could not build models: {e}\033[0m")
+    return time.perf_counter() - start
+
+
+def start_warm_up() -> threading.Thread:
+    """
+    Run warm_up() once per process in a daemon thread and return that thread.
+    """
+    global _warm_up_thread
+    with _warm_up_lock:
+        if _warm_up_thread is None:
+            _warm_up_thread = threading.Thread(
+                target=warm_up, name="deep-research-warm-up", daemon=True
+            )
+            _warm_up_thread.start()
+        return _warm_up_thread
 
 
 def search_google(query: str, num_results: int = 10) -> list:
@@ -28,7 +182,7 @@ def search_google(query: str, num_results: int = 10) -> list:
         num_results: Number of results to return (default: 10)
     
     Returns:
-        List of search results with title, link, and snippet
+        List of search results with title, link, snippet and date (may be empty)
     """
     params = {
         "engine": "google",
@@ -37,11 +191,16 @@ def search_google(query: str, num_results: int = 10) -> list:
         "hl": "en",
         "gl": "us",
         "num": num_results,
-        "api_key": SERP_API_KEY
     }
-    
-    search = GoogleSearch(params)
-    results = search.get_dict()
+
+    def _search() -> dict:
+        from serpapi import GoogleSearch
+
+        search = GoogleSearch({**params, "api_key": SERP_API_KEY})
+        return search.get_dict()
+
+    # Goes through the record/replay cassette (a plain call when it is off)
+    results = get_cassette().call("serpapi", params, _search, scope="google")
     
     organic_results = results.get("organic_results", [])
     
@@ -49,20 +208,245 @@ def search_google(query: str, num_results: int = 10) -> list:
         {
             "title": r.get("title", ""),
             "link": r.get("link", ""),
-            "snippet": r.get("snippet", "")
+            "snippet": r.get("snippet", ""),
+            "date": r.get("date", ""),
         }
         for r in organic_results
     ]
 
 
-def run_deep_research(user_query: str) -> str:
+@contextmanager
+def open_scraping_tools():
+    """
+    Connect to the Scraping MCP server and yield its tools.
+
+    With an active cassette the tool calls are recorded; in replay mode the
+    recorded tools are served without connecting to the server.
+    """
+    cassette = get_cassette()
+    if cassette.replaying:
+        yield cassette.replay_tools(SCRAPING_MCP_URL)
+        return
+
+    from smolagents import MCPClient
+
+    with MCPClient({"url": SCRAPING_MCP_URL, "transport": "streamable-http"}) as scraping_tools:
+        yield cassette.wrap_tools(SCRAPING_MCP_URL, list(scraping_tools))
+
+
+def build_search_tool(prefetcher: Prefetcher = None, ranker: ResultRanker = None):
+    """
+    Return the `search_web` tool (Google via SerpAPI) for sub-agents. With a
+    ranker, results are reordered and pruned first; with a prefetcher, the top
+    results are scraped in the background right away.
+    """
+    from smolagents import tool
+
+    @tool
+    def search_web(query: str) -> str:
+        """
+        Search the web using Google via SerpAPI.
+        
+        Args:
+            query (str): The search query to find relevant information.
+        
+        Returns:
+            str: JSON string containing search results (best first) with titles, links, snippets and dates.
+        """
+        print(f"Searching the web for: {query}")
+        results = search_google(query)
+        if ranker is not None:
+            results = ranker.rank(query, results)
+        if prefetcher is not None:
+            prefetcher.schedule(results)
+        return json.dumps(results, indent=2, ensure_ascii=False)
+
+    return search_web
+
+
+@contextmanager
+def open_subagent_tools(prefetcher: Prefetcher = None, ranker: ResultRanker = None):
+    """
+    Yield the sub-agent toolset: SerpAPI search + page scraping tools
+    (selected by SCRAPER_BACKEND).
+
+    With a prefetcher, scrape calls are served from its warm cache when possible.
+    With a ranker, search results are triaged and scraped pages marked as read.
+    """
+    if SCRAPER_BACKEND not in ("mcp", "native", "both"):
+        raise ValueError(f"Unknown SCRAPER_BACKEND {SCRAPER_BACKEND!r}")
+
+    with ExitStack() as stack:
+        if SCRAPER_BACKEND == "mcp":
+            scraping_tools = list(stack.enter_context(open_scraping_tools()))
+        else:
+            # The native scraper works on its own; MCP is only needed for fallback
+            try:
+                mcp_tools = list(stack.enter_context(open_scraping_tools()))
+            except Exception as e:
+                print(f"\033[91mScraping MCP server unavailable ({e}), "
+                      f"native scraper runs without JavaScript fallback\033[0m")
+                mcp_tools = []
+            native_tool = build_native_scrape_tool(fallback_tool=find_scrape_tool(mcp_tools))
+            # Native tool first so that it is the one picked for prefetching
+            scraping_tools = [native_tool] + (mcp_tools if SCRAPER_BACKEND == "both" else [])
+
+        tools = [build_search_tool(prefetcher, ranker)] + scraping_tools
+        if prefetcher is not None:
+            tools = prefetcher.wrap_tools(tools)
+        if ranker is not None:
+            # Outermost, so that background prefetches are not counted as reads
+            tools = ranker.wrap_tools(tools)
+        yield tools
+
+
+def format_upstream_reports(upstream_reports: dict = None) -> str:
+    """
+    Render the reports of upstream subtasks for a dependent sub-agent's prompt.
+    """
+    if not upstream_reports:
+        return ""
+    reports = "\n".join(
+        UPSTREAM_REPORT_TEMPLATE.format(subtask_id=subtask_id, report=report)
+        for subtask_id, report in upstream_reports.items()
+    )
+    return UPSTREAM_REPORTS_TEMPLATE.format(reports=reports)
+
+
+def run_subagent(tools: list, user_query: str, research_plan: str, subtask_id: str,
+                 subtask_title: str, subtask_description: str, upstream_reports: dict = None,
+                 usage: UsageTracker = None) -> str:
+    """
+    Run a dedicated research sub-agent for a single subtask and return its markdown report.
+    """
+    if usage is None:
+        usage = UsageTracker()
+
+    budget_level = usage.budget_level()
+    if budget_level == BUDGET_EXHAUSTED:
+        usage.event(f"skipping subtask {subtask_id}")
+        return f"# {subtask_id} {subtask_title}\n\n(Subtask skipped: the run budget was exhausted.)"
+
+    from smolagents import ToolCallingAgent
+
+    _, model = get_models()
+    cascade = None
+    if budget_level != BUDGET_OK and get_budget_model() is not None:
+        usage.event(f"using {BUDGET_FALLBACK_MODEL} for subtask {subtask_id}")
+        model = get_budget_model()
+    elif get_fast_model() is not None:
+        # Tool-driving steps on the fast model, final report on the large one
+        cascade = model = CascadeModel(get_fast_model(), model, usage=usage, agent_name=f"subagent_{subtask_id}")
+
+    print(f"Initializing Subagent for task {subtask_id}...")
+
+    # Bounded memory: sliding window + compacted observations + prompt cap
+    memory_policy = SubagentMemoryPolicy()
+
+    subagent = ToolCallingAgent(
+        tools=tools + [memory_policy.recall_tool()],  # SerpAPI search + Scraping MCP tools
+        model=model,
+        add_base_tools=False,
+        name=f"subagent_{subtask_id}",
+        # The cascade records its own calls (per tier, with latency)
+        step_callbacks=[memory_policy, usage.step_callback("subagent", model.model_id, record=cascade is None)],
+    )
+
+    subagent_prompt = SUBAGENT_PROMPT_TEMPLATE.format(
+        user_query=user_query,
+        research_plan=research_plan,
+        subtask_id=subtask_id,
+        subtask_title=subtask_title,
+        subtask_description=subtask_description,
+        upstream_reports=format_upstream_reports(upstream_reports),
+    )
+
+    report = usage.run_agent(subagent, subagent_prompt, "subagent", model.model_id, record=cascade is None)
+    print(f"Subagent {subtask_id} memory: {memory_policy.summary()}")
+    if cascade is not None:
+        print(f"Subagent {subtask_id} cascade: {cascade.summary()}")
+    return report
+
+
+def run_subagent_job(job: dict, tools: list, ranker: ResultRanker = None,
+                     prefetcher: Prefetcher = None) -> dict:
+    """
+    Execute a queued sub-agent job (see job_queue.py) inside a worker process.
+
+    The job carries its share of the run budget and the pages already read in
+    the run; the worker's usage (and search ranking and prefetch counters, newly
+    read pages, cassette recordings) are returned so the dispatching process can
+    merge them into the run's UsageTracker (and ResultRanker / Prefetcher /
+    cassette).
+    """
+    if prefetcher is not None:
+        # PREFETCH_MAX_BYTES applies per job, not per worker lifetime
+        prefetcher.reset()
+    if ranker is not None:
+        # Start from the pages already read in the run, as threads mode does
+        seen = set(job.get("read_urls") or ())
+        ranker.reset_reads(seen)
+        before = ranker.snapshot()
+    budget = job.get("budget") or {}
+    usage = UsageTracker(budget_usd=budget.get("usd", 0), budget_tokens=budget.get("tokens", 0))
+    report = run_subagent(
+        tools,
+        job["user_query"],
+        job["research_plan"],
+        job["subtask_id"],
+        job["subtask_title"],
+        job["subtask_description"],
+        upstream_reports=job.get("upstream_reports"),
+        usage=usage,
+    )
+    ranking, read_urls = None, []
+    if ranker is not None:
+        ranking = {k: v - before[k] for k, v in ranker.snapshot().items()}
+        read_urls = [url for url in ranker.read_urls() if url not in seen]
+    return {
+        "report": report,
+        "usage_calls": usage.calls,
+        "usage_events": usage.events,
+        "ranking": ranking,
+        "read_urls": read_urls,
+        "cassette_entries": get_cassette().drain() if get_cassette().recording else None,
+        "prefetch": prefetcher.summary() if prefetcher is not None else None,
+    }
+
+
+def run_deep_research(user_query: str, usage: UsageTracker = None, store: RunStore = None) -> str:
+    from planner import generate_research_plan
+    from task_splitter import split_into_subtasks
+    from smolagents import ToolCallingAgent, tool
+
     print("Running the deep research...")
+    run_start = time.perf_counter()
+    timings = {"subtasks_s": {}}
+    subtask_reports = {}
+
+    get_cassette().meta.setdefault("query", user_query)
+
+    # Token / cost accounting and run budget
+    if usage is None:
+        usage = UsageTracker()
+    usage.check_prices({
+        "planner": os.environ.get("PLANNER_MODEL", "gpt-4o"),
+        "task splitter": os.environ.get("TASK_MODEL", "gpt-4o"),
+        "coordinator": COORDINATOR_MODEL,
+        "sub-agent": SUBAGENT_MODEL,
+        "sub-agent fast": SUBAGENT_FAST_MODEL,
+        "budget fallback": BUDGET_FALLBACK_MODEL,
+    })
 
     # 1) Generate research plan
-    research_plan = generate_research_plan(user_query)
+    t0 = time.perf_counter()
+    research_plan = generate_research_plan(user_query, usage=usage)
+    timings["plan_s"] = time.perf_counter() - t0
 
     # 2) Split into explicit subtasks
-    subtasks = split_into_subtasks(research_plan)
+    t0 = time.perf_counter()
+    subtasks = split_into_subtasks(research_plan, usage=usage)
+    timings["split_s"] = time.perf_counter() - t0
 
     # 3) Coordinator + sub-agents with SerpAPI search and Scraping MCP
     print("Initializing Coordinator")
@@ -70,39 +454,80 @@ def run_deep_research(user_query: str) -> str:
     print("Coordinator LLM URL: ", COORDINATOR_LLM_URL)
     print("Subagent Model: ", SUBAGENT_MODEL)
     print("Subagent LLM URL: ", SUBAGENT_LLM_URL)
+    if SUBAGENT_FAST_MODEL:
+        print("Subagent Fast Model: ", SUBAGENT_FAST_MODEL)
+        print("Subagent Fast LLM URL: ", SUBAGENT_FAST_LLM_URL)
 
-    coordinator_model = LiteLLMModel(
-        model_id=f"openai/{COORDINATOR_MODEL}",
-        api_key=os.environ.get("OPENAI_API_KEY"),
-        api_base=COORDINATOR_LLM_URL,
-    )
-    subagent_model = LiteLLMModel(
-        model_id=f"openai/{SUBAGENT_MODEL}",
-        api_key=os.environ.get("OPENAI_API_KEY"),
-        api_base=SUBAGENT_LLM_URL,
-    )
+    coordinator_model, _ = get_models()
 
-    # Connect to Scraping MCP server
-    with MCPClient({"url": SCRAPING_MCP_URL, "transport": "streamable-http"}) as scraping_tools:
-        
-        # ---- Search Tool using SerpAPI --------------------------------------
-        @tool
-        def search_web(query: str) -> str:
-            """
-            Search the web using Google via SerpAPI.
-            
-            Args:
-                query (str): The search query to find relevant information.
-            
-            Returns:
-                str: JSON string containing search results with titles, links, and snippets.
-            """
-            print(f"Searching the web for: {query}")
-            results = search_google(query)
-            return json.dumps(results, indent=2, ensure_ascii=False)
+    # Search-result triage; counters of worker processes are merged into it
+    ranker = ResultRanker()
+
+    with ExitStack() as stack:
+        if SUBAGENT_EXECUTION == "queue":
+            # Sub-agents run in worker processes (possibly on other hosts)
+            dispatcher = get_dispatcher()
+            # Only collects the prefetch counters reported by the workers
+            prefetcher = Prefetcher()
+            all_tools = None
+        else:
+            # Connect to Scraping MCP server, shared by all sub-agent threads
+            dispatcher = None
+            # Opt-in speculative scraping of top search results (PREFETCH_TOP_K)
+            prefetcher = stack.enter_context(Prefetcher())
+            all_tools = stack.enter_context(open_subagent_tools(prefetcher, ranker))
+        # Record the cassette even if the run fails halfway
+        stack.callback(get_cassette().save)
+
+        undispatched, undispatched_lock = len(subtasks), threading.Lock()
+
+        def run_one(subtask_id: str, subtask_title: str, subtask_description: str,
+                    upstream_reports: dict = None) -> str:
+            if dispatcher is None:
+                return run_subagent(all_tools, user_query, research_plan, subtask_id,
+                                    subtask_title, subtask_description, upstream_reports, usage)
 
-        # Combine search tool with scraping MCP tools
-        all_tools = [search_web] + list(scraping_tools)
+            nonlocal undispatched
+            with undispatched_lock:
+                parts = min(SUBTASK_MAX_WORKERS, undispatched)
+                undispatched -= 1
+            if usage.budget_level() == BUDGET_EXHAUSTED:
+                usage.event(f"skipping subtask {subtask_id}")
+                return f"# {subtask_id} {subtask_title}\n\n(Subtask skipped: the run budget was exhausted.)"
+            # Jobs that may run at the same time each get a share of what is left
+            budget = usage.reserve_budget(parts)
+            try:
+                result = dispatcher.submit({
+                    "user_query": user_query,
+                    "research_plan": research_plan,
+                    "subtask_id": subtask_id,
+                    "subtask_title": subtask_title,
+                    "subtask_description": subtask_description,
+                    "upstream_reports": upstream_reports,
+                    "budget": budget,
+                    "read_urls": ranker.read_urls(),
+                }).result()
+                usage.merge(result["usage_calls"], result["usage_events"])
+                get_cassette().merge(result.get("cassette_entries") or ())
+            finally:
+                usage.release_budget(budget)
+            if result.get("ranking"):
+                ranker.merge(result["ranking"])
+            ranker.add_reads(result.get("read_urls") or ())
+            if result.get("prefetch"):
+                prefetcher.merge(result["prefetch"])
+            return result["report"]
+
+        def run_subtask(subtask: dict, upstream_reports: dict) -> str:
+            t0 = time.perf_counter()
+            report = run_one(subtask["id"], subtask["title"], subtask["description"], upstream_reports)
+            timings["subtasks_s"][subtask["id"]] = time.perf_counter() - t0
+            subtask_reports[subtask["id"]] = report
+            return report
+
+        # Sub-agents start as soon as their dependencies are done (critical path
+        # first); the coordinator's tool calls collect their reports.
+        scheduler = stack.enter_context(SubtaskScheduler(subtasks, run_subtask))
 
         # ---- Initialize Subagent TOOL --------------------------------------
         @tool
@@ -119,30 +544,17 @@ def run_deep_research(user_query: str) -> str:
             - Has access to search_web tool (SerpAPI) for web search.
             - Has access to scraping MCP tools for crawling web pages.
             - Must perform deep research ONLY on this subtask.
+            - Receives the reports of the subtasks it depends on, if any.
             - Returns a structured markdown report with:
               - a clear heading identifying the subtask,
               - a narrative explanation,
               - bullet-point key findings,
               - explicit citations / links to sources.
             """
-            print(f"Initializing Subagent for task {subtask_id}...")
-
-            subagent = ToolCallingAgent(
-                tools=all_tools,  # SerpAPI search + Scraping MCP tools
-                model=subagent_model,
-                add_base_tools=False,
-                name=f"subagent_{subtask_id}",
-            )
-
-            subagent_prompt = SUBAGENT_PROMPT_TEMPLATE.format(
-                user_query=user_query,
-                research_plan=research_plan,
-                subtask_id=subtask_id,
-                subtask_title=subtask_title,
-                subtask_description=subtask_description,
-            )
-            
-            return subagent.run(subagent_prompt)
+            if subtask_id in scheduler:
+                return scheduler.result(subtask_id)
+            # Not part of the split plan: run it directly
+            return run_one(subtask_id, subtask_title, subtask_description)
 
         # ---- Coordinator agent ---------------------------------------------
         coordinator = ToolCallingAgent(
@@ -150,6 +562,7 @@ def run_deep_research(user_query: str) -> str:
             model=coordinator_model,
             add_base_tools=False,
             name="coordinator_agent",
+            step_callbacks=[usage.step_callback("coordinator", coordinator_model.model_id)],
         )
 
         # Coordinator prompt: it gets the list of subtasks and the tool
@@ -161,5 +574,37 @@ def run_deep_research(user_query: str) -> str:
             subtasks_json=subtasks_json,
         )
 
-        final_report = coordinator.run(coordinator_prompt)
-        return final_report
+        t0 = time.perf_counter()
+        final_report = usage.run_agent(coordinator, coordinator_prompt, "coordinator", coordinator_model.model_id)
+        timings["coordinator_s"] = time.perf_counter() - t0
+
+    timings["total_s"] = time.perf_counter() - run_start
+    if dispatcher is not None:
+        print(f"Job queue metrics: {json.dumps(dispatcher.metrics(), ensure_ascii=False)}")
+
+    ranking = ranker.summary(findings=len(extract_sources(*subtask_reports.values())))
+    print(f"Search ranking: {json.dumps(ranking, ensure_ascii=False)}")
+
+    total = usage.summary()["total"]
+    print(f"Token usage: {total['input_tokens']} in / {total['output_tokens']} out, "
+          f"cost ${total['cost_usd']:.4f}")
+    for tier, stats in usage.summary()["by_tier"].items():
+        print(f"Model tier {tier}: {stats['calls']} calls, {stats['input_tokens']} in / "
+              f"{stats['output_tokens']} out, mean latency {stats['mean_latency_s']}s, "
+              f"{stats['escalated']} escalated")
+
+    if store is not None:
+        run_id = store.append({
+            "query": user_query,
+            "plan": research_plan,
+            "subtasks": subtasks,
+            "subtask_reports": subtask_reports,
+            "final_report": final_report,
+            "sources": extract_sources(final_report, *subtask_reports.values()),
+            "timings": timings,
+            "usage": usage.summary(),
+            "prefetch": prefetcher.summary(),
+            "ranking": ranking,
+        })
+        print(f"Run saved to history (id {run_id})")
+    return final_report
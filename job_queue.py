@@ -0,0 +1,559 @@
+"""
+Distributed execution of sub-agent jobs through a job queue.
+
+With SUBAGENT_EXECUTION=queue, coordinator.run_deep_research does not run
+sub-agents in its own process. Each sub-agent run is serialized as a job
+(a plain dict) and put on a broker; worker processes (see worker.py) take
+jobs, run them with coordinator.run_subagent_job and post the results back.
+
+- Brokers are pluggable: `create_broker(url)` picks an implementation by URL
+  scheme (`register_broker` adds new ones, e.g. a Redis-backed broker).
+  Built in are "manager://host:port", a TCP-reachable stand-in built on
+  multiprocessing managers (workers may run on other hosts), and "memory://",
+  an in-process broker for worker threads.
+- Workers send heartbeats with their current job and throughput counters.
+- The JobDispatcher collects results into futures, re-queues jobs whose worker
+  stopped heartbeating (worker death) up to JOB_QUEUE_MAX_ATTEMPTS times, fails
+  jobs when no worker is alive (e.g. all local workers died during start-up),
+  and reports per-worker throughput metrics.
+- The manager broker unpickles client data, so JOB_QUEUE_AUTHKEY is required
+  on a non-loopback address; a loopback broker without one generates a random
+  key that its local workers inherit.
+- Each job carries its share of the run budget and the pages already read in
+  the run at dispatch time; sub-agents running at the same time on different
+  workers only see each other's reads once they finish. Usage, ranking and
+  prefetch counters and cassette recordings come back with the result.
+"""
+import ipaddress
+import os
+import queue
+import secrets
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from multiprocessing.managers import BaseManager, DictProxy
+
+# Job queue configuration via environment variables
+JOB_QUEUE_URL = os.environ.get("JOB_QUEUE_URL", "manager://127.0.0.1:0")
+# Required when the manager broker listens on a non-loopback address; a random
+# key is generated for loopback brokers (inherited by local worker processes)
+JOB_QUEUE_AUTHKEY = os.environ.get("JOB_QUEUE_AUTHKEY")
+# Worker processes started by the dispatcher itself; 0 = only external workers
+JOB_QUEUE_LOCAL_WORKERS = int(os.environ.get("JOB_QUEUE_LOCAL_WORKERS", "4"))
+JOB_QUEUE_HEARTBEAT_S = float(os.environ.get("JOB_QUEUE_HEARTBEAT_S", "5"))
+JOB_QUEUE_HEARTBEAT_TIMEOUT_S = float(os.environ.get("JOB_QUEUE_HEARTBEAT_TIMEOUT_S", "30"))
+JOB_QUEUE_MAX_ATTEMPTS = int(os.environ.get("JOB_QUEUE_MAX_ATTEMPTS", "3"))
+
+
+class Broker:
+    """
+    Interface of a job queue broker. Jobs and results are JSON-able dicts.
+    """
+
+    url = None
+
+    def put_job(self, job: dict):
+        raise NotImplementedError
+
+    def get_job(self, timeout: float) -> dict:
+        """Return the next job, or None after `timeout` seconds."""
+        raise NotImplementedError
+
+    def put_result(self, result: dict):
+        raise NotImplementedError
+
+    def get_result(self, timeout: float) -> dict:
+        """Return the next result, or None after `timeout` seconds."""
+        raise NotImplementedError
+
+    def heartbeat(self, worker_id: str, info: dict):
+        raise NotImplementedError
+
+    def heartbeats(self) -> dict:
+        """Latest heartbeat per worker id."""
+        raise NotImplementedError
+
+
+_BROKERS = {}
+
+
+def register_broker(scheme: str, factory):
+    """
+    Register `factory(url, serve: bool) -> Broker` for URLs starting with `scheme://`.
+    `serve` is True on the dispatcher side and False on the worker side.
+    """
+    _BROKERS[scheme] = factory
+
+
+def create_broker(url: str = JOB_QUEUE_URL, serve: bool = False) -> Broker:
+    scheme = url.split("://", 1)[0]
+    if scheme not in _BROKERS:
+        raise ValueError(f"No job queue broker registered for {scheme!r} (known: {sorted(_BROKERS)})")
+    return _BROKERS[scheme](url, serve)
+
+
+def _get(q, timeout):
+    try:
+        return q.get(timeout=timeout)
+    except queue.Empty:
+        return None
+
+
+# ---- in-process broker ----------------------------------------------------------
+class MemoryBroker(Broker):
+    """Broker for workers running as threads of the dispatching process."""
+
+    def __init__(self, url: str = "memory://", serve: bool = True):
+        self.url = url
+        self._jobs = queue.Queue()
+        self._results = queue.Queue()
+        self._heartbeats = {}
+
+    def put_job(self, job):
+        self._jobs.put(job)
+
+    def get_job(self, timeout):
+        return _get(self._jobs, timeout)
+
+    def put_result(self, result):
+        self._results.put(result)
+
+    def get_result(self, timeout):
+        return _get(self._results, timeout)
+
+    def heartbeat(self, worker_id, info):
+        self._heartbeats[worker_id] = info
+
+    def heartbeats(self):
+        return dict(self._heartbeats)
+
+
+_memory_brokers = {}
+
+
+def _memory_broker(url, serve):
+    # One broker per URL so dispatcher and worker threads share it
+    return _memory_brokers.setdefault(url, MemoryBroker(url))
+
+
+register_broker("memory", _memory_broker)
+
+
+# ---- multiprocessing manager broker ---------------------------------------------
+_served_jobs = queue.Queue()
+_served_results = queue.Queue()
+_served_heartbeats = {}
+
+
+def _served_jobs_queue():
+    return _served_jobs
+
+
+def _served_results_queue():
+    return _served_results
+
+
+def _served_heartbeats_dict():
+    return _served_heartbeats
+
+
+class _QueueManager(BaseManager):
+    pass
+
+
+_QueueManager.register("jobs", callable=_served_jobs_queue)
+_QueueManager.register("results", callable=_served_results_queue)
+_QueueManager.register("heartbeats", callable=_served_heartbeats_dict, proxytype=DictProxy)
+
+
+def _is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+class ManagerBroker(Broker):
+    """
+    Broker served over TCP by the dispatching process with multiprocessing
+    managers; workers on this or other hosts connect with the same URL and
+    JOB_QUEUE_AUTHKEY.
+
+    The manager unpickles what clients send, so anyone holding the authkey can
+    run code in the dispatcher: a non-loopback broker requires an explicit key.
+    """
+
+    def __init__(self, url: str, serve: bool = False, authkey: str = None):
+        host, port = url.split("://", 1)[1].rsplit(":", 1)
+        address = (host, int(port))
+        authkey = authkey or os.environ.get("JOB_QUEUE_AUTHKEY") or JOB_QUEUE_AUTHKEY
+        if not authkey:
+            if not _is_loopback(host):
+                raise ValueError(f"JOB_QUEUE_AUTHKEY must be set for a broker on non-loopback host {host!r}")
+            if not serve:
+                raise ValueError("JOB_QUEUE_AUTHKEY is not set; use the key of the dispatcher")
+            # Local-only broker: a random key, passed on to spawned local workers
+            authkey = secrets.token_hex(16)
+            os.environ["JOB_QUEUE_AUTHKEY"] = authkey
+        manager = _QueueManager(address=address, authkey=authkey.encode("utf-8"))
+        if serve:
+            server = manager.get_server()
+            threading.Thread(target=server.serve_forever, name="job-queue-broker", daemon=True).start()
+            # Port 0 binds a free port; advertise the real one to workers
+            address = server.address
+            manager = _QueueManager(address=address, authkey=authkey.encode("utf-8"))
+        manager.connect()
+        self.url = f"manager://{address[0]}:{address[1]}"
+        self._manager = manager
+        self._lock = threading.Lock()
+        self._jobs = manager.jobs()
+        self._results = manager.results()
+        self._heartbeats = manager.heartbeats()
+
+    # Manager proxies are not thread-safe; serialize access per broker
+    def put_job(self, job):
+        with self._lock:
+            self._jobs.put(job)
+
+    def get_job(self, timeout):
+        # Poll so a blocking get does not hold the lock for `timeout`
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                job = _get(self._jobs, 0)
+            if job is not None or time.monotonic() >= deadline:
+                return job
+            time.sleep(min(0.1, timeout))
+
+    def put_result(self, result):
+        with self._lock:
+            self._results.put(result)
+
+    def get_result(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                result = _get(self._results, 0)
+            if result is not None or time.monotonic() >= deadline:
+                return result
+            time.sleep(min(0.1, timeout))
+
+    def heartbeat(self, worker_id, info):
+        with self._lock:
+            self._heartbeats[worker_id] = info
+
+    def heartbeats(self):
+        with self._lock:
+            return self._heartbeats.copy()
+
+
+register_broker("manager", ManagerBroker)
+
+
+# ---- worker ---------------------------------------------------------------------
+class Worker:
+    """
+    Take jobs from a broker and run them with `handler(job) -> dict` until stopped.
+    """
+
+    def __init__(self, broker: Broker, handler, worker_id: str = None,
+                 heartbeat_s: float = JOB_QUEUE_HEARTBEAT_S):
+        self.broker = broker
+        self.handler = handler
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.heartbeat_s = heartbeat_s
+        self.started_at = time.time()
+        self.current_job = None
+        self.jobs_done = 0
+        self.jobs_failed = 0
+        self.busy_s = 0.0
+        self._stop = threading.Event()
+        self._heartbeating = False
+
+    def stop(self):
+        self._stop.set()
+
+    def start_heartbeats(self):
+        """Announce the worker and keep heartbeating (also while it is starting up)."""
+        if self._heartbeating:
+            return
+        self._heartbeating = True
+        self.send_heartbeat()
+        threading.Thread(target=self._heartbeat_loop, name="worker-heartbeat", daemon=True).start()
+
+    def send_heartbeat(self):
+        self.broker.heartbeat(self.worker_id, {
+            "t": time.time(),
+            "host": socket.gethostname(),
+            "pid": os.getpid(),
+            "job_id": self.current_job,
+            "started_at": self.started_at,
+            "jobs_done": self.jobs_done,
+            "jobs_failed": self.jobs_failed,
+            "busy_s": round(self.busy_s, 3),
+        })
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(self.heartbeat_s):
+            try:
+                self.send_heartbeat()
+            except Exception as e:
+                print(f"\033[91mWorker {self.worker_id}: heartbeat failed: {e}\033[0m")
+
+    def run(self):
+        print(f"Worker {self.worker_id} waiting for jobs on {self.broker.url}")
+        self.start_heartbeats()
+
+        while not self._stop.is_set():
+            job = self.broker.get_job(timeout=1.0)
+            if job is None:
+                continue
+
+            # Announce the job right away so the dispatcher can track its owner
+            self.current_job = job["job_id"]
+            self.send_heartbeat()
+            start = time.perf_counter()
+            try:
+                result = {"ok": True, "value": self.handler(job["payload"])}
+                self.jobs_done += 1
+            except Exception as e:
+                result = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+                self.jobs_failed += 1
+            elapsed = time.perf_counter() - start
+            self.busy_s += elapsed
+            self.current_job = None
+
+            self.broker.put_result({
+                "job_id": job["job_id"],
+                "attempt": job["attempt"],
+                "worker_id": self.worker_id,
+                "elapsed_s": round(elapsed, 3),
+                **result,
+            })
+            self.send_heartbeat()
+
+
+# ---- dispatcher -------------------------------------------------------------------
+class JobDispatcher:
+    """
+    Submit jobs to a broker and resolve their futures from the result stream.
+
+        dispatcher = JobDispatcher(create_broker(serve=True))
+        report = dispatcher.submit({...}).result()
+    """
+
+    def __init__(self, broker: Broker, heartbeat_timeout_s: float = JOB_QUEUE_HEARTBEAT_TIMEOUT_S,
+                 max_attempts: int = JOB_QUEUE_MAX_ATTEMPTS):
+        self.broker = broker
+        self.heartbeat_timeout_s = heartbeat_timeout_s
+        self.max_attempts = max_attempts
+        self.retries = 0
+        self.completed = 0
+        self.failed = 0
+        self._pending = {}  # job_id -> {"job", "future", "owner"}
+        self._lock = threading.Lock()
+        self._processes = []
+        self._dead_processes = set()
+        self._stop = threading.Event()
+        self._collector = threading.Thread(target=self._collect, name="job-collector", daemon=True)
+        self._collector.start()
+
+    def submit(self, payload: dict) -> Future:
+        job = {"job_id": uuid.uuid4().hex, "attempt": 1, "submitted_at": time.time(), "payload": payload}
+        future = Future()
+        with self._lock:
+            self._pending[job["job_id"]] = {"job": job, "future": future, "owner": None}
+        self.broker.put_job(job)
+        return future
+
+    def start_local_workers(self, count: int):
+        """
+        Start `count` workers on this host connected to our broker: threads for
+        the in-process broker, separate processes otherwise.
+        """
+        import multiprocessing
+
+        for _ in range(count):
+            if isinstance(self.broker, MemoryBroker):
+                threading.Thread(target=run_worker, args=(self.broker.url,), daemon=True).start()
+                continue
+            # spawn: a fresh interpreter, not a fork of a process full of threads
+            process = multiprocessing.get_context("spawn").Process(
+                target=run_worker, args=(self.broker.url,), daemon=False
+            )
+            process.start()
+            self._processes.append(process)
+
+    def close(self):
+        self._stop.set()
+        for process in self._processes:
+            process.terminate()
+        for process in self._processes:
+            process.join(timeout=5)
+
+    def _collect(self):
+        last_check = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                result = self.broker.get_result(timeout=0.5)
+                if result is not None:
+                    self._resolve(result)
+                if time.monotonic() - last_check >= 1.0:
+                    self._check_workers()
+                    last_check = time.monotonic()
+            except Exception as e:
+                # Keep collecting; a broker hiccup must not orphan every pending job
+                print(f"\033[91mJob queue: collector error: {e}\033[0m")
+                time.sleep(1.0)
+
+    def _resolve(self, result: dict):
+        with self._lock:
+            entry = self._pending.get(result["job_id"])
+            # Ignore results of attempts that were already superseded
+            if entry is None or entry["job"]["attempt"] != result["attempt"]:
+                return
+            del self._pending[result["job_id"]]
+        if result["ok"]:
+            self.completed += 1
+            entry["future"].set_result(result["value"])
+        else:
+            self.failed += 1
+            entry["future"].set_exception(RuntimeError(f"Job failed on {result['worker_id']}: {result['error']}"))
+
+    def _check_workers(self):
+        """
+        Re-queue jobs whose worker stopped sending heartbeats; fail all pending
+        jobs when no worker is alive to run them.
+        """
+        heartbeats = self.broker.heartbeats()
+        now = time.time()
+        for process in self._processes:
+            if process.exitcode is not None and process.pid not in self._dead_processes:
+                self._dead_processes.add(process.pid)
+                print(f"\033[91mJob queue: local worker process {process.pid} exited "
+                      f"with code {process.exitcode}\033[0m")
+        live = [
+            hb for hb in heartbeats.values()
+            if now - hb.get("t", 0) < self.heartbeat_timeout_s
+            and not (hb.get("host") == socket.gethostname() and hb.get("pid") in self._dead_processes)
+        ]
+        if not live:
+            all_local_dead = bool(self._processes) and len(self._dead_processes) == len(self._processes)
+            last_seen = max([hb.get("t", 0) for hb in heartbeats.values()], default=0)
+            self._fail_pending(
+                "no live job queue worker (see worker output above)",
+                lambda job: all_local_dead
+                or now - max(job["submitted_at"], last_seen) >= self.heartbeat_timeout_s,
+            )
+            return
+
+        requeue, give_up = [], []
+        with self._lock:
+            for job_id, entry in self._pending.items():
+                for worker_id, hb in heartbeats.items():
+                    if hb.get("job_id") == job_id:
+                        entry["owner"] = worker_id
+                owner = entry["owner"]
+                if owner is None or now - heartbeats.get(owner, {}).get("t", 0) < self.heartbeat_timeout_s:
+                    continue
+                entry["owner"] = None
+                if entry["job"]["attempt"] >= self.max_attempts:
+                    give_up.append(job_id)
+                else:
+                    entry["job"] = {**entry["job"], "attempt": entry["job"]["attempt"] + 1}
+                    requeue.append(entry["job"])
+            for job_id in give_up:
+                self._pending.pop(job_id)["future"].set_exception(
+                    RuntimeError(f"Job {job_id} lost its worker {self.max_attempts} times")
+                )
+                self.failed += 1
+
+        for job in requeue:
+            self.retries += 1
+            print(f"\033[91mJob queue: worker lost, retrying job {job['job_id']} "
+                  f"(attempt {job['attempt']})\033[0m")
+            self.broker.put_job(job)
+
+    def _fail_pending(self, reason: str, should_fail):
+        with self._lock:
+            failed = {job_id: entry for job_id, entry in self._pending.items() if should_fail(entry["job"])}
+            for job_id in failed:
+                del self._pending[job_id]
+        for job_id, entry in failed.items():
+            entry["future"].set_exception(RuntimeError(f"Job {job_id} failed: {reason}"))
+            self.failed += 1
+
+    def metrics(self) -> dict:
+        now = time.time()
+        workers = {}
+        for worker_id, hb in self.broker.heartbeats().items():
+            uptime = max(now - hb["started_at"], 1e-9)
+            workers[worker_id] = {
+                "host": hb["host"],
+                "alive": now - hb["t"] < self.heartbeat_timeout_s,
+                "current_job": hb["job_id"],
+                "jobs_done": hb["jobs_done"],
+                "jobs_failed": hb["jobs_failed"],
+                "jobs_per_min": round(hb["jobs_done"] / uptime * 60, 3),
+                "utilization": round(hb["busy_s"] / uptime, 3),
+            }
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "completed": self.completed,
+            "failed": self.failed,
+            "retries": self.retries,
+            "pending": pending,
+            "workers": workers,
+        }
+
+
+def run_worker(broker_url: str = JOB_QUEUE_URL):
+    """
+    Worker process entry point: connect to the broker, open the sub-agent tools
+    once and run jobs until terminated.
+    """
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    # With CASSETTE_MODE=record, recordings are returned with each job result
+    # and saved by the dispatching process
+    import coordinator
+
+    from prefetch import Prefetcher
+    from ranking import ResultRanker
+
+    broker = create_broker(broker_url)
+    worker = Worker(broker, None)
+    # Alive while opening the tools; a worker that dies here stops heartbeating
+    worker.start_heartbeats()
+    ranker = ResultRanker()
+    with Prefetcher() as prefetcher, coordinator.open_subagent_tools(prefetcher, ranker) as tools:
+        worker.handler = lambda job: coordinator.run_subagent_job(job, tools, ranker, prefetcher)
+        worker.run()
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher() -> JobDispatcher:
+    """
+    Process-wide dispatcher serving JOB_QUEUE_URL, with JOB_QUEUE_LOCAL_WORKERS
+    local worker processes started on first use.
+    """
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            import atexit
+
+            _dispatcher = JobDispatcher(create_broker(JOB_QUEUE_URL, serve=True))
+            print(f"Job queue broker listening on {_dispatcher.broker.url}")
+            if JOB_QUEUE_LOCAL_WORKERS:
+                _dispatcher.start_local_workers(JOB_QUEUE_LOCAL_WORKERS)
+            atexit.register(_dispatcher.close)
+        return _dispatcher
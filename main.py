@@ -1,14 +1,24 @@
-from coordinator import run_deep_research
 from dotenv import load_dotenv
 
+# Load environment variables before the modules below read their configuration
+load_dotenv()
+
+from coordinator import run_deep_research, start_warm_up
+from run_store import RunStore
+from usage import UsageTracker
+
 def main():
-    load_dotenv()
+    # Import heavy dependencies and build the LLM clients while the user types
+    start_warm_up()
     user_query = input("Enter your research query: ")
-    result = run_deep_research(user_query)
+    usage = UsageTracker()
+    result = run_deep_research(user_query, usage=usage, store=RunStore())
     with open("research_result.md", "w") as f:
         f.write(result)
+    usage.write_summary("research_usage.json")
 
     print("Research result saved to research_result.md")
+    print("Token usage and cost summary saved to research_usage.json")
 
 
 if __name__ == "__main__":
@@ -1,8 +1,9 @@
 import os
-from openai import OpenAI
+from types import SimpleNamespace
 from prompts import PLANNER_SYSTEM_INSTRUCTIONS
+from cassette import get_cassette
 
-def generate_research_plan(user_query: str) -> str:
+def generate_research_plan(user_query: str, usage=None) -> str:
     PLANNER_LLM_URL = os.environ.get("PLANNER_LLM_URL", "https://api.openai.com/v1")
     PLANNER_MODEL = os.environ.get("PLANNER_MODEL", "gpt-4o")
 
@@ -10,21 +11,10 @@ def generate_research_plan(user_query: str) -> str:
     print("MODEL: ", PLANNER_MODEL)
     print("LLM_URL: ", PLANNER_LLM_URL)
 
-    planner_client = OpenAI(
-        api_key=os.environ.get("OPENAI_API_KEY"),
-        base_url=PLANNER_LLM_URL,
-    )
-    completion = planner_client.chat.completions.create(
-        model=PLANNER_MODEL,
-        messages=[
-            {"role": "system", "content": PLANNER_SYSTEM_INSTRUCTIONS},
-            {"role": "user", "content": user_query},
-        ],
-        stream=True,
-    )
-
-    print("\033[93mGenerated Research Plan:\033[0m")
-    research_plan = ""
+    messages = [
+        {"role": "system", "content": PLANNER_SYSTEM_INSTRUCTIONS},
+        {"role": "user", "content": user_query},
+    ]
 
     def _content(obj):
         try:
@@ -35,16 +25,59 @@ def generate_research_plan(user_query: str) -> str:
             except Exception:
                 return None
 
-    try:
-        for chunk in completion:
-            c = _content(chunk)
+    def _stream_plan() -> dict:
+        from openai import OpenAI
+
+        planner_client = OpenAI(
+            api_key=os.environ.get("OPENAI_API_KEY"),
+            base_url=PLANNER_LLM_URL,
+        )
+        completion = planner_client.chat.completions.create(
+            model=PLANNER_MODEL,
+            messages=messages,
+            stream=True,
+            # Ask for a final chunk carrying token usage (for usage accounting)
+            stream_options={"include_usage": True},
+        )
+
+        print("\033[93mGenerated Research Plan:\033[0m")
+        research_plan = ""
+        token_usage = None
+
+        try:
+            for chunk in completion:
+                token_usage = getattr(chunk, "usage", None) or token_usage
+                c = _content(chunk)
+                if c:
+                    research_plan += c
+                    print(c, end="")
+        except TypeError:
+            token_usage = getattr(completion, "usage", None)
+            c = _content(completion)
             if c:
-                research_plan += c
+                research_plan = c
                 print(c, end="")
-    except TypeError:
-        c = _content(completion)
-        if c:
-            research_plan = c
-            print(c, end="")
+
+        return {
+            "content": research_plan,
+            "usage": {
+                "prompt_tokens": token_usage.prompt_tokens,
+                "completion_tokens": token_usage.completion_tokens,
+            } if token_usage is not None else None,
+        }
+
+    # Goes through the record/replay cassette (a plain call when it is off)
+    cassette = get_cassette()
+    result = cassette.call(
+        "openai", {"model": PLANNER_MODEL, "messages": messages}, _stream_plan, scope="planner"
+    )
+    research_plan = result["content"]
+    if cassette.replaying:
+        print("\033[93mGenerated Research Plan:\033[0m")
+        print(research_plan, end="")
+
+    if usage is not None:
+        token_usage = SimpleNamespace(**result["usage"]) if result["usage"] else None
+        usage.record_openai_usage("planner", "planner", PLANNER_MODEL, token_usage, research_plan)
 
     return research_plan
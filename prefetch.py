@@ -0,0 +1,256 @@
+"""
+Speculative prefetch of top search results into a warm scrape cache.
+
+A sub-agent usually searches, spends an LLM round trip deciding what to read
+and then scrapes one of the top few links. With prefetching enabled, as soon
+as `search_web` returns, the top-k not yet seen links are scraped in the
+background (bounded by PREFETCH_CONCURRENCY and PREFETCH_MAX_BYTES). A later
+scrape call for one of those URLs is served from the warm (or in-flight)
+result instead of paying the scrape latency after the thinking time.
+
+PREFETCH_MAX_PAGE_BYTES is reserved per prefetch at schedule time, so
+concurrent prefetches cannot overshoot the budget; larger pages are not kept.
+On queue workers the budget applies per job (reset()). Hit and waste ratios
+are reported so that PREFETCH_TOP_K can be tuned.
+"""
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urldefrag
+
+# Opt-in: number of top search results to prefetch per search (0 disables)
+PREFETCH_TOP_K = int(os.environ.get("PREFETCH_TOP_K", "0"))
+PREFETCH_CONCURRENCY = int(os.environ.get("PREFETCH_CONCURRENCY", "4"))
+# Upper bound on the total size of prefetched pages kept per run (per job on workers)
+PREFETCH_MAX_BYTES = int(os.environ.get("PREFETCH_MAX_BYTES", str(8 * 1024 * 1024)))
+# Bytes reserved from that budget by each prefetch; larger pages are not kept
+PREFETCH_MAX_PAGE_BYTES = int(os.environ.get("PREFETCH_MAX_PAGE_BYTES", str(1024 * 1024)))
+# Scraping tool to prefetch with; by default the first tool with "scrape" in its
+# name and a "url" input
+SCRAPE_TOOL_NAME = os.environ.get("SCRAPE_TOOL_NAME")
+# Extra arguments (JSON) passed by prefetch scrapes; calls with the same
+# arguments are served from the warm cache
+PREFETCH_SCRAPE_ARGS = json.loads(os.environ.get("PREFETCH_SCRAPE_ARGS", "{}"))
+
+
+def normalize_url(url: str) -> str:
+    url = urldefrag(url.strip())[0]
+    return url[:-1] if url.endswith("/") else url
+
+
+def find_scrape_tool(tools: list, name: str = SCRAPE_TOOL_NAME):
+    """
+    Return the tool used to scrape a single URL, or None.
+    """
+    for t in tools:
+        if name:
+            if t.name == name:
+                return t
+        elif "scrape" in t.name.lower() and "url" in t.inputs:
+            return t
+    return None
+
+
+class Prefetcher:
+    """
+    Background prefetcher bound to one scraping tool.
+
+        with Prefetcher() as prefetcher:
+            tools = prefetcher.wrap_tools(tools)   # scrape calls use the warm cache
+            prefetcher.schedule(search_results)    # after every search
+    """
+
+    def __init__(self, top_k: int = PREFETCH_TOP_K, concurrency: int = PREFETCH_CONCURRENCY,
+                 max_bytes: int = PREFETCH_MAX_BYTES, max_page_bytes: int = PREFETCH_MAX_PAGE_BYTES,
+                 scrape_args: dict = None):
+        self.top_k = top_k
+        self.concurrency = max(concurrency, 1)
+        self.max_bytes = max_bytes
+        self.max_page_bytes = min(max_page_bytes, max_bytes)
+        self.scrape_args = dict(PREFETCH_SCRAPE_ARGS if scrape_args is None else scrape_args)
+        self._scrape = None
+        self._pool = None
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        Start a new budget: forget prefetched pages and zero the counters (a
+        worker process reuses one prefetcher for the jobs of many runs).
+        """
+        with self._lock:
+            for future in getattr(self, "_futures", {}).values():
+                if future is not None:
+                    future.cancel()
+            # Prefetches of the previous budget that are still running finish
+            # without touching the new counters
+            self._generation = getattr(self, "_generation", 0) + 1
+            self._futures = {}  # normalized url -> Future
+            self._served = set()
+            self._reserved = 0  # bytes reserved by prefetches still running
+            self.stats = {
+                "scheduled": 0,
+                "used": 0,
+                "hits": 0,
+                "hits_in_flight": 0,
+                "misses": 0,
+                "errors": 0,
+                "skipped_bytes_budget": 0,
+                "oversized": 0,
+                "bytes": 0,
+            }
+
+    @property
+    def enabled(self) -> bool:
+        return self.top_k > 0 and self._scrape is not None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            print(f"Prefetch: {json.dumps(self.summary())}")
+
+    # ---- wiring ----------------------------------------------------------------
+    def wrap_tools(self, tools: list) -> list:
+        """
+        Bind to the scraping tool in `tools` and return the tools with that tool
+        replaced by a cache-aware proxy. A no-op when prefetching is disabled.
+        """
+        if self.top_k <= 0:
+            return tools
+        scrape_tool = find_scrape_tool(tools)
+        if scrape_tool is None:
+            print("\033[91mPrefetch: no scraping tool found, prefetching disabled\033[0m")
+            return tools
+
+        self._scrape = scrape_tool
+        self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="prefetch")
+        return [self._make_proxy(t) if t is scrape_tool else t for t in tools]
+
+    def _make_proxy(self, scrape_tool):
+        from smolagents import Tool
+
+        prefetcher = self
+
+        class PrefetchingScrapeTool(Tool):
+            name = scrape_tool.name
+            description = scrape_tool.description
+            inputs = scrape_tool.inputs
+            output_type = scrape_tool.output_type
+            skip_forward_signature_validation = True
+
+            def forward(self, *args, **kwargs):
+                return prefetcher.fetch(kwargs, lambda: scrape_tool(*args, **kwargs))
+
+        return PrefetchingScrapeTool()
+
+    # ---- prefetch & serve ---------------------------------------------------------
+    def schedule(self, results: list):
+        """
+        Start background scrapes of the top-k new links of a search result list.
+        """
+        if not self.enabled:
+            return
+        started = 0
+        for result in results:
+            if started >= self.top_k:
+                break
+            url = result.get("link")
+            if not url:
+                continue
+            key = normalize_url(url)
+            with self._lock:
+                if key in self._futures:
+                    continue
+                # Reserve the page's worst-case size up front so concurrent
+                # prefetches cannot overshoot the budget
+                if self.stats["bytes"] + self._reserved + self.max_page_bytes > self.max_bytes:
+                    self.stats["skipped_bytes_budget"] += 1
+                    continue
+                self._reserved += self.max_page_bytes
+                self._futures[key] = self._pool.submit(self._prefetch, url, self._generation)
+                self.stats["scheduled"] += 1
+            started += 1
+
+    def _prefetch(self, url: str, generation: int):
+        try:
+            content = self._scrape(url=url, **self.scrape_args)
+        except Exception:
+            with self._lock:
+                if generation == self._generation:
+                    self._reserved -= self.max_page_bytes
+            raise
+        size = len(str(content).encode("utf-8"))
+        with self._lock:
+            if generation != self._generation:
+                return content
+            self._reserved -= self.max_page_bytes
+            if size > self.max_page_bytes:
+                # Not kept; the agent's own scrape call fetches it again
+                self.stats["oversized"] += 1
+                raise ValueError(f"Prefetched page of {size} bytes exceeds PREFETCH_MAX_PAGE_BYTES")
+            self.stats["bytes"] += size
+        return content
+
+    def fetch(self, kwargs: dict, scrape):
+        """
+        Serve a scrape call from the warm cache if it matches a prefetch, else call `scrape()`.
+        """
+        url = kwargs.get("url")
+        extra = {k: v for k, v in kwargs.items() if k != "url" and v is not None}
+        future = None
+        if url and extra == self.scrape_args:
+            with self._lock:
+                future = self._futures.get(normalize_url(url))
+
+        if future is None:
+            with self._lock:
+                self.stats["misses"] += 1
+                if url:
+                    # Already read: do not prefetch it again later
+                    self._futures.setdefault(normalize_url(url), None)
+            return scrape()
+
+        in_flight = not future.done()
+        try:
+            content = future.result()
+        except Exception:
+            with self._lock:
+                self.stats["errors"] += 1
+            return scrape()
+        with self._lock:
+            self.stats["hits"] += 1
+            self.stats["hits_in_flight"] += int(in_flight)
+            if normalize_url(url) not in self._served:
+                self._served.add(normalize_url(url))
+                self.stats["used"] += 1
+        return content
+
+    def merge(self, stats: dict):
+        """Add counters reported by another prefetcher (e.g. in a worker process)."""
+        with self._lock:
+            for key in self.stats:
+                self.stats[key] += stats.get(key, 0)
+
+    def summary(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+        used = stats["used"]
+        scheduled = stats["scheduled"]
+        stats.update({
+            "top_k": self.top_k,
+            "wasted": scheduled - used,
+            # Share of prefetched pages that were read / thrown away
+            "hit_ratio": round(used / scheduled, 3) if scheduled else 0.0,
+            "waste_ratio": round((scheduled - used) / scheduled, 3) if scheduled else 0.0,
+            # Share of scrape calls served from the warm cache
+            "served_ratio": round(stats["hits"] / (stats["hits"] + stats["misses"]), 3)
+            if stats["hits"] + stats["misses"] else 0.0,
+        })
+        return stats
@@ -19,14 +19,20 @@ GUIDELINES:
 TASK_SPLITTER_SYSTEM_INSTRUCTIONS = """
 You will be given a set of research instructions (a research plan).
 Your job is to break this plan into a set of coherent, non-overlapping
-subtasks that can be researched independently by separate agents.
+subtasks that will be researched by separate agents, in parallel wherever
+possible.
 
 Requirements:
 - 3 to 8 subtasks is usually a good range. Use your judgment.
 - Each subtask should have:
   - an 'id' (short string),
   - a 'title' (short descriptive title),
-  - a 'description' (clear, detailed instructions for the sub-agent).
+  - a 'description' (clear, detailed instructions for the sub-agent),
+  - a 'depends_on' list with the ids of subtasks whose findings it needs
+    as input (e.g. "establish the baseline first, then compare").
+    Leave it empty for independent subtasks.
+- Only add a dependency when the subtask genuinely cannot be done without
+  the other subtask's report. Dependencies must not form cycles.
 - Subtasks should collectively cover the full scope of the original plan
   without unnecessary duplication.
 - Prefer grouping by dimensions: time periods, regions, actors, themes,
@@ -44,7 +50,8 @@ Return ONLY valid JSON with this schema:
     {
       "id": "string",
       "title": "string",
-      "description": "string"
+      "description": "string",
+      "depends_on": ["string"]
     }
   ]
 }
@@ -62,11 +69,13 @@ Overall research plan:
 Your specific subtask (ID: {subtask_id}, Title: {subtask_title}) is:
 
 \"\"\"{subtask_description}\"\"\"
-
+{upstream_reports}
 Instructions:
 - Focus ONLY on this subtask, but keep the global query in mind for context.
 - Use the available tools to search for up-to-date, high-quality sources.
 - Prioritize primary and official sources when possible.
+- Search results come ranked best first; read the top results before going
+  further down, and skip results marked "already_read".
 - Be explicit about uncertainties, disagreements in the literature, and gaps.
 - Return your results as a MARKDOWN report with this structure:
 
@@ -88,6 +97,17 @@ Well-structured explanation with subsections as needed.
 Now perform the research and return ONLY the markdown report.
 """
 
+UPSTREAM_REPORTS_TEMPLATE = """
+This subtask builds on the following reports from subtasks it depends on.
+Use them as your starting point instead of re-researching what they cover:
+
+{reports}
+"""
+
+UPSTREAM_REPORT_TEMPLATE = """--- Report of subtask {subtask_id} ---
+{report}
+"""
+
 COORDINATOR_PROMPT_TEMPLATE = """
 You are the LEAD RESEARCH COORDINATOR AGENT.
 
@@ -107,7 +127,8 @@ Each element has the shape:
 {{
 “id”: “timeframe_confirmation”,
 “title”: “Confirm Research Scope Parameters”,
-“description”: “Analyze the scope parameters…”
+“description”: “Analyze the scope parameters…”,
+“depends_on”: []
 }}
 
 You have access to a tool called:
@@ -119,6 +140,8 @@ with:
 • subtask_id       = subtask[“id”]
 • subtask_title    = subtask[“title”]
 • subtask_description = subtask[“description”]
+   Subtasks with a non-empty depends_on are automatically given the reports
+   of the subtasks they depend on; you do not need to pass them yourself.
 2. Wait for all sub-agent reports to come back. Each tool call returns a
 markdown report for that subtask.
 3. After you have results for ALL subtasks, synthesize them into a SINGLE,
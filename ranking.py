@@ -0,0 +1,312 @@
+"""
+Deterministic triage of search results before they reach a sub-agent.
+
+Every result of `search_web` gets a local score from four signals:
+- authority:  preferred (official / primary / academic) vs. demoted domains
+              (content farms, social media, paywalls); blocked domains are dropped
+- relevance:  overlap of the query terms with the title and snippet
+- recency:    age of the result's date (exponential decay)
+- position:   Google's own rank
+
+Results already read in this run are penalized. Only the best
+SEARCH_RESULTS_KEEP results above SEARCH_MIN_SCORE are returned, so agents
+see fewer, better links and scrape fewer pages. The effect is reported as
+pages read per finding (cited source).
+"""
+import json
+import math
+import os
+import re
+import threading
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
+
+from prefetch import find_scrape_tool, normalize_url
+
+# Ranking configuration via environment variables
+SEARCH_RANKING = os.environ.get("SEARCH_RANKING", "on")  # on | off
+SEARCH_RESULTS_KEEP = int(os.environ.get("SEARCH_RESULTS_KEEP", "5"))
+SEARCH_MIN_SCORE = float(os.environ.get("SEARCH_MIN_SCORE", "0.25"))
+SEARCH_RECENCY_HALF_LIFE_DAYS = float(os.environ.get("SEARCH_RECENCY_HALF_LIFE_DAYS", "365"))
+# Score multiplier for results whose page was already read in this run
+SEARCH_READ_PENALTY = float(os.environ.get("SEARCH_READ_PENALTY", "0.3"))
+# Domain lists: comma-separated, and/or a JSON file {"preferred": [...], "demoted": [...], "blocked": [...]}
+SEARCH_DOMAIN_LISTS_FILE = os.environ.get("SEARCH_DOMAIN_LISTS_FILE")
+SEARCH_PREFERRED_DOMAINS = os.environ.get("SEARCH_PREFERRED_DOMAINS", "")
+SEARCH_DEMOTED_DOMAINS = os.environ.get("SEARCH_DEMOTED_DOMAINS", "")
+SEARCH_BLOCKED_DOMAINS = os.environ.get("SEARCH_BLOCKED_DOMAINS", "")
+
+WEIGHTS = {"authority": 0.3, "relevance": 0.45, "recency": 0.15, "position": 0.1}
+
+# Entries starting with "." match a domain suffix (".gov" matches "nasa.gov")
+DEFAULT_DOMAIN_LISTS = {
+    "preferred": [
+        ".gov", ".edu", ".int", ".mil", ".gov.uk", ".ac.uk", ".go.kr", ".ac.kr", ".europa.eu",
+        "arxiv.org", "doi.org", "nature.com", "science.org", "sciencedirect.com", "springer.com",
+        "acm.org", "ieee.org", "nih.gov", "who.int", "oecd.org", "worldbank.org", "imf.org",
+        "un.org", "github.com", "docs.python.org",
+    ],
+    "demoted": [
+        # Content farms, social media and login walls
+        "pinterest.com", "quora.com", "facebook.com", "instagram.com", "tiktok.com",
+        "twitter.com", "x.com", "linkedin.com", "scribd.com", "coursehero.com",
+        # Hard paywalls
+        "wsj.com", "ft.com", "bloomberg.com", "economist.com", "statista.com",
+    ],
+    "blocked": [],
+}
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "how", "in", "is", "it",
+    "of", "on", "or", "that", "the", "to", "vs", "what", "when", "which", "who", "why", "with",
+}
+TOKEN = re.compile(r"\w+", re.UNICODE)
+RELATIVE_DATE = re.compile(r"(\d+)\s+(minute|hour|day|week|month|year)s?\s+ago", re.I)
+DATE_FORMATS = ("%b %d, %Y", "%B %d, %Y", "%d %b %Y", "%Y-%m-%d", "%b %Y", "%Y")
+UNIT_DAYS = {"minute": 1 / 1440, "hour": 1 / 24, "day": 1, "week": 7, "month": 30, "year": 365}
+
+
+def load_domain_lists() -> dict:
+    """
+    Default lists, extended by SEARCH_DOMAIN_LISTS_FILE and the SEARCH_*_DOMAINS variables.
+    """
+    lists = {k: list(v) for k, v in DEFAULT_DOMAIN_LISTS.items()}
+    if SEARCH_DOMAIN_LISTS_FILE:
+        with open(SEARCH_DOMAIN_LISTS_FILE) as f:
+            for key, domains in json.load(f).items():
+                lists.setdefault(key, []).extend(domains)
+    for key, value in (("preferred", SEARCH_PREFERRED_DOMAINS), ("demoted", SEARCH_DEMOTED_DOMAINS),
+                       ("blocked", SEARCH_BLOCKED_DOMAINS)):
+        lists[key].extend(d.strip().lower() for d in value.split(",") if d.strip())
+    return lists
+
+
+def domain_matches(host: str, domains: list) -> bool:
+    for d in domains:
+        if d.startswith("."):
+            if host.endswith(d):
+                return True
+        elif host == d or host.endswith("." + d):
+            return True
+    return False
+
+
+def query_terms(text: str) -> set:
+    return {t for t in TOKEN.findall(text.lower()) if t not in STOPWORDS and len(t) > 1}
+
+
+def parse_result_date(value: str, now: datetime = None):
+    """
+    Parse SerpAPI's `date` ("Mar 5, 2024", "3 days ago", ...); None if unknown.
+    """
+    if not value:
+        return None
+    now = now or datetime.now()
+    m = RELATIVE_DATE.search(value)
+    if m:
+        return now - timedelta(days=int(m.group(1)) * UNIT_DAYS[m.group(2).lower()])
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value.strip(), fmt)
+        except ValueError:
+            continue
+    return None
+
+
+class ResultRanker:
+    """
+    Scores, reorders and prunes search results; tracks pages read in the run.
+
+        ranker = ResultRanker()
+        tools = ranker.wrap_tools(tools)        # scrape calls mark pages as read
+        results = ranker.rank(query, results)   # after every search
+    """
+
+    def __init__(self, keep: int = SEARCH_RESULTS_KEEP, min_score: float = SEARCH_MIN_SCORE,
+                 domain_lists: dict = None, enabled: bool = SEARCH_RANKING != "off"):
+        self.keep = keep
+        self.min_score = min_score
+        self.enabled = enabled
+        self.domain_lists = domain_lists if domain_lists is not None else load_domain_lists()
+        self._read = set()
+        self._ranks = {}  # normalized url -> rank at which it was shown
+        self._lock = threading.Lock()
+        self.stats = {
+            "searches": 0,
+            "results_in": 0,
+            "results_out": 0,
+            "pruned_blocked": 0,
+            "pruned_low_score": 0,
+            "pages_read": 0,
+            "pages_read_ranked": 0,
+            "read_rank_sum": 0,
+        }
+
+    # ---- scoring -----------------------------------------------------------------
+    def authority(self, url: str):
+        host = (urlparse(url).hostname or "").lower()
+        if host.startswith("www."):
+            host = host[4:]
+        if domain_matches(host, self.domain_lists.get("blocked", [])):
+            return None
+        if domain_matches(host, self.domain_lists.get("preferred", [])):
+            return 1.0
+        if domain_matches(host, self.domain_lists.get("demoted", [])):
+            return 0.0
+        return 0.5
+
+    def score(self, terms: set, result: dict, position: int, now: datetime = None):
+        """
+        Score in [0, 1] of one result, or None if its domain is blocked.
+        """
+        authority = self.authority(result.get("link", ""))
+        if authority is None:
+            return None
+
+        if terms:
+            title = query_terms(result.get("title", ""))
+            snippet = query_terms(result.get("snippet", ""))
+            relevance = (2 * len(terms & title) + len(terms & snippet)) / (2 * len(terms))
+            relevance = min(relevance, 1.0)
+        else:
+            relevance = 0.5
+
+        date = parse_result_date(result.get("date", ""), now)
+        if date is None:
+            recency = 0.5
+        else:
+            age_days = max((now or datetime.now()) - date, timedelta(0)).days
+            recency = math.pow(0.5, age_days / SEARCH_RECENCY_HALF_LIFE_DAYS)
+
+        score = (
+            WEIGHTS["authority"] * authority
+            + WEIGHTS["relevance"] * relevance
+            + WEIGHTS["recency"] * recency
+            + WEIGHTS["position"] / (1 + position)
+        )
+        with self._lock:
+            already_read = normalize_url(result.get("link", "")) in self._read
+        return score * SEARCH_READ_PENALTY if already_read else score
+
+    def rank(self, query: str, results: list) -> list:
+        """
+        Return `results` best first, without blocked and low-scoring ones, at
+        most `keep` of them (the best non-blocked result is always kept).
+        """
+        if not self.enabled:
+            return results
+
+        terms = query_terms(query)
+        now = datetime.now()
+        scored, blocked = [], 0
+        for position, result in enumerate(results):
+            score = self.score(terms, result, position, now)
+            if score is None:
+                blocked += 1
+            else:
+                scored.append((score, position, result))
+        scored.sort(key=lambda s: (-s[0], s[1]))
+
+        kept = [s for s in scored if s[0] >= self.min_score] or scored[:1]
+        if self.keep > 0:
+            kept = kept[: self.keep]
+
+        ranked = []
+        with self._lock:
+            for rank, (score, _, result) in enumerate(kept):
+                key = normalize_url(result.get("link", ""))
+                self._ranks.setdefault(key, rank)
+                ranked.append({**result, "already_read": True} if key in self._read else result)
+            self.stats["searches"] += 1
+            self.stats["results_in"] += len(results)
+            self.stats["results_out"] += len(ranked)
+            self.stats["pruned_blocked"] += blocked
+            self.stats["pruned_low_score"] += len(scored) - len(kept)
+        return ranked
+
+    # ---- read tracking -------------------------------------------------------------
+    def mark_read(self, url: str):
+        key = normalize_url(url)
+        with self._lock:
+            self.stats["pages_read"] += 1
+            self._read.add(key)
+            if key in self._ranks:
+                self.stats["pages_read_ranked"] += 1
+                self.stats["read_rank_sum"] += self._ranks[key]
+
+    def reset_reads(self, read_urls=()):
+        """
+        Forget read pages (a worker process serves sub-agents of many runs) and
+        start from `read_urls`, the pages already read in the job's run.
+        """
+        with self._lock:
+            self._read = set(read_urls)
+            self._ranks.clear()
+
+    def add_reads(self, read_urls):
+        """Mark pages read by another ranker (e.g. in a worker process), without counting them."""
+        with self._lock:
+            self._read.update(read_urls)
+
+    def read_urls(self) -> list:
+        """Normalized URLs of the pages read so far."""
+        with self._lock:
+            return sorted(self._read)
+
+    def wrap_tools(self, tools: list) -> list:
+        """
+        Return `tools` with the scraping tool replaced by a proxy that marks the
+        pages it reads. A no-op when ranking is disabled or no scraping tool exists.
+        """
+        scrape_tool = find_scrape_tool(tools) if self.enabled else None
+        if scrape_tool is None:
+            return tools
+
+        from smolagents import Tool
+
+        ranker = self
+
+        class ReadTrackingScrapeTool(Tool):
+            name = scrape_tool.name
+            description = scrape_tool.description
+            inputs = scrape_tool.inputs
+            output_type = scrape_tool.output_type
+            skip_forward_signature_validation = True
+
+            def forward(self, *args, **kwargs):
+                if kwargs.get("url"):
+                    ranker.mark_read(kwargs["url"])
+                return scrape_tool(*args, **kwargs)
+
+        return [ReadTrackingScrapeTool() if t is scrape_tool else t for t in tools]
+
+    # ---- reporting -------------------------------------------------------------------
+    def merge(self, stats: dict):
+        """Add counters reported by another ranker (e.g. in a worker process)."""
+        with self._lock:
+            for key, value in stats.items():
+                if key in self.stats:
+                    self.stats[key] += value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self.stats)
+
+    def summary(self, findings: int = None) -> dict:
+        """
+        Counters plus derived ratios; `findings` is the number of sources cited
+        in the sub-agent reports, giving the pages-per-finding metric.
+        """
+        stats = self.snapshot()
+        stats.update({
+            "enabled": self.enabled,
+            "keep": self.keep,
+            "prune_ratio": round(1 - stats["results_out"] / stats["results_in"], 3)
+            if stats["results_in"] else 0.0,
+            "mean_read_rank": round(stats["read_rank_sum"] / stats["pages_read_ranked"], 2)
+            if stats["pages_read_ranked"] else None,
+        })
+        if findings is not None:
+            stats["findings"] = findings
+            stats["pages_per_finding"] = round(stats["pages_read"] / findings, 2) if findings else None
+        return stats
@@ -0,0 +1,163 @@
+"""
+Append-only history of research runs.
+
+Runs are stored in SQLite: a small `runs` table with the columns needed to
+list and preview runs, a zlib-compressed JSON blob with the full record
+(query, plan, subtasks, per-subtask reports, final report, sources, timings,
+usage), and a contentless FTS5 index over query, plan and reports for search.
+Loading a past run is a primary-key lookup plus decompression; no LLM is
+involved.
+"""
+import json
+import os
+import re
+import sqlite3
+import time
+import zlib
+from contextlib import contextmanager
+
+# Location of the run history database
+RUN_STORE_PATH = os.environ.get("RUN_STORE_PATH", "research_runs.db")
+
+PREVIEW_CHARS = 300
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    query TEXT NOT NULL,
+    preview TEXT NOT NULL,
+    elapsed_s REAL,
+    cost_usd REAL,
+    data BLOB NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS runs_fts USING fts5(
+    query, plan, reports, content=''
+);
+"""
+
+MARKDOWN_LINK = re.compile(r"\[([^\]]*)\]\((https?://[^)\s]+)\)")
+BARE_URL = re.compile(r"(?<!\()https?://[^\s)\]>\"']+")
+
+
+def extract_sources(*texts: str) -> list:
+    """
+    Collect unique sources ({title, url}) from markdown links and bare URLs, in order.
+    """
+    sources, seen = [], set()
+    for text in texts:
+        if not text:
+            continue
+        found = [(m.group(1), m.group(2)) for m in MARKDOWN_LINK.finditer(text)]
+        found += [("", m.group(0).rstrip(".,;")) for m in BARE_URL.finditer(text)]
+        for title, url in found:
+            if url not in seen:
+                seen.add(url)
+                sources.append({"title": title, "url": url})
+    return sources
+
+
+def _fts_query(text: str) -> str:
+    # Quote every term (FTS5 syntax characters are literal) and prefix-match it
+    terms = [t.replace('"', '""') for t in text.split()]
+    return " ".join(f'"{t}"*' for t in terms)
+
+
+class RunStore:
+    """
+    SQLite-backed, append-only run history. Safe to share across threads:
+    every operation uses its own short-lived connection.
+    """
+
+    def __init__(self, path: str = RUN_STORE_PATH):
+        self.path = path
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:  # commit on success, roll back on error
+                yield conn
+        finally:
+            conn.close()
+
+    def append(self, run: dict) -> int:
+        """
+        Store a run record and return its id.
+
+        Expected keys: query, plan, subtasks, subtask_reports ({id: markdown}),
+        final_report, sources, timings and optionally usage.
+        """
+        run = dict(run)
+        run.setdefault("created_at", time.time())
+        if "sources" not in run:
+            run["sources"] = extract_sources(
+                run.get("final_report", ""), *(run.get("subtask_reports") or {}).values()
+            )
+
+        final_report = run.get("final_report") or ""
+        data = zlib.compress(json.dumps(run, ensure_ascii=False).encode("utf-8"), 6)
+        cost = ((run.get("usage") or {}).get("total") or {}).get("cost_usd")
+
+        with self._connect() as conn:
+            cur = conn.execute(
+                "INSERT INTO runs (created_at, query, preview, elapsed_s, cost_usd, data) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    run["created_at"],
+                    run.get("query", ""),
+                    " ".join(final_report.split())[:PREVIEW_CHARS],
+                    (run.get("timings") or {}).get("total_s"),
+                    cost,
+                    data,
+                ),
+            )
+            run_id = cur.lastrowid
+            conn.execute(
+                "INSERT INTO runs_fts (rowid, query, plan, reports) VALUES (?, ?, ?, ?)",
+                (
+                    run_id,
+                    run.get("query", ""),
+                    run.get("plan", ""),
+                    "\n".join([final_report, *(run.get("subtask_reports") or {}).values()]),
+                ),
+            )
+        return run_id
+
+    def get(self, run_id: int) -> dict:
+        """
+        Load the full record of a run, or None if it does not exist.
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT id, data FROM runs WHERE id = ?", (run_id,)).fetchone()
+        if row is None:
+            return None
+        run = json.loads(zlib.decompress(row["data"]).decode("utf-8"))
+        run["id"] = row["id"]
+        return run
+
+    def search(self, text: str = "", limit: int = 20) -> list:
+        """
+        Full-text search over queries, plans and reports; most recent runs
+        first when `text` is empty.
+
+        Returns:
+            List of run summaries: id, created_at, query, preview, elapsed_s, cost_usd
+        """
+        columns = "runs.id, runs.created_at, runs.query, runs.preview, runs.elapsed_s, runs.cost_usd"
+        with self._connect() as conn:
+            if text.strip():
+                rows = conn.execute(
+                    f"SELECT {columns} FROM runs_fts JOIN runs ON runs.id = runs_fts.rowid "
+                    "WHERE runs_fts MATCH ? ORDER BY rank LIMIT ?",
+                    (_fts_query(text), limit),
+                ).fetchall()
+            else:
+                rows = conn.execute(
+                    f"SELECT {columns} FROM runs ORDER BY runs.id DESC LIMIT ?", (limit,)
+                ).fetchall()
+        return [dict(r) for r in rows]
@@ -0,0 +1,182 @@
+"""
+Dependency-aware scheduling of research subtasks.
+
+Subtasks may declare `depends_on` edges (see task_splitter.Subtask). The
+SubtaskScheduler runs every subtask whose dependencies are finished
+concurrently, hands the upstream reports to the dependent subtask, and picks
+among ready subtasks by critical path (longest remaining chain first), so the
+total wall time tracks the longest chain rather than the sum of all subtasks.
+"""
+import heapq
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List
+
+# Maximum number of sub-agents running at the same time
+SUBTASK_MAX_WORKERS = int(os.environ.get("SUBTASK_MAX_WORKERS", "4"))
+
+
+def validate_dependency_graph(subtasks: List[dict]) -> None:
+    """
+    Check that subtask ids are unique and that `depends_on` edges form a DAG.
+
+    Raises:
+        ValueError: on missing or duplicate ids, unknown or self dependencies, or cycles
+    """
+    if any(not t.get("id") for t in subtasks):
+        raise ValueError("Subtask without an id")
+    ids = [t["id"] for t in subtasks]
+    duplicates = sorted({i for i in ids if ids.count(i) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate subtask ids: {duplicates}")
+
+    known = set(ids)
+    for t in subtasks:
+        for dep in t.get("depends_on") or []:
+            if dep == t["id"]:
+                raise ValueError(f"Subtask {t['id']!r} depends on itself")
+            if dep not in known:
+                raise ValueError(f"Subtask {t['id']!r} depends on unknown subtask {dep!r}")
+
+    # Depth-first search for a back edge
+    deps = {t["id"]: list(t.get("depends_on") or []) for t in subtasks}
+    state = {}  # id -> "visiting" | "done"
+
+    def visit(node, path):
+        state[node] = "visiting"
+        for dep in deps[node]:
+            if state.get(dep) == "visiting":
+                cycle = path[path.index(dep):] + [dep]
+                raise ValueError(f"Subtask dependency cycle: {' -> '.join(cycle)}")
+            if dep not in state:
+                visit(dep, path + [dep])
+        state[node] = "done"
+
+    for node in deps:
+        if node not in state:
+            visit(node, [node])
+
+
+def critical_path_lengths(subtasks: List[dict]) -> Dict[str, int]:
+    """
+    Length (in subtasks, including itself) of the longest chain starting at each
+    subtask and following dependents downstream.
+    """
+    dependents = {t["id"]: [] for t in subtasks}
+    for t in subtasks:
+        for dep in t.get("depends_on") or []:
+            dependents[dep].append(t["id"])
+
+    lengths = {}
+
+    def length(node):
+        if node not in lengths:
+            lengths[node] = 1 + max((length(d) for d in dependents[node]), default=0)
+        return lengths[node]
+
+    for t in subtasks:
+        length(t["id"])
+    return lengths
+
+
+class SubtaskScheduler:
+    """
+    Run `run_subtask(subtask, upstream_reports)` for every subtask, respecting
+    dependencies. Results are available per subtask id through `result()`.
+
+        with SubtaskScheduler(subtasks, run_subtask) as scheduler:
+            report = scheduler.result("A")
+    """
+
+    def __init__(
+        self,
+        subtasks: List[dict],
+        run_subtask: Callable[[dict, Dict[str, str]], str],
+        max_workers: int = SUBTASK_MAX_WORKERS,
+    ):
+        validate_dependency_graph(subtasks)
+        self.subtasks = {t["id"]: t for t in subtasks}
+        self.run_subtask = run_subtask
+        self.max_workers = max(max_workers, 1)
+        self.priority = critical_path_lengths(subtasks)
+        self.order = {t["id"]: i for i, t in enumerate(subtasks)}
+        self._futures = {task_id: Future() for task_id in self.subtasks}
+        self._closed = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def start(self):
+        order = sorted(self.subtasks, key=self._sort_key)
+        print(f"Subtask schedule (critical path first): {', '.join(order)}")
+        self._thread = threading.Thread(target=self._dispatch, name="subtask-scheduler", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """Stop launching new subtasks and wait for running ones."""
+        self._closed.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def result(self, subtask_id: str, timeout: float = None) -> str:
+        return self._futures[subtask_id].result(timeout=timeout)
+
+    def __contains__(self, subtask_id: str) -> bool:
+        return subtask_id in self._futures
+
+    def _sort_key(self, task_id):
+        return (-self.priority[task_id], self.order[task_id])
+
+    def _upstream_reports(self, task_id) -> Dict[str, str]:
+        reports = {}
+        for dep in self.subtasks[task_id].get("depends_on") or []:
+            future = self._futures[dep]
+            if future.exception() is not None:
+                reports[dep] = f"(Upstream subtask {dep} failed: {future.exception()})"
+            else:
+                reports[dep] = future.result()
+        return reports
+
+    def _dispatch(self):
+        remaining = {
+            task_id: set(task.get("depends_on") or []) for task_id, task in self.subtasks.items()
+        }
+        ready = [self._sort_key(t) + (t,) for t, deps in remaining.items() if not deps]
+        heapq.heapify(ready)
+        for entry in ready:
+            del remaining[entry[-1]]
+
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="subtask") as pool:
+            while ready or running:
+                while ready and len(running) < self.max_workers and not self._closed.is_set():
+                    task_id = heapq.heappop(ready)[-1]
+                    upstream = self._upstream_reports(task_id)
+                    running[pool.submit(self.run_subtask, self.subtasks[task_id], upstream)] = task_id
+
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task_id = running.pop(future)
+                    if future.exception() is not None:
+                        self._futures[task_id].set_exception(future.exception())
+                    else:
+                        self._futures[task_id].set_result(future.result())
+
+                    for other, deps in list(remaining.items()):
+                        deps.discard(task_id)
+                        if not deps:
+                            del remaining[other]
+                            heapq.heappush(ready, self._sort_key(other) + (other,))
+
+        # Anything never started (scheduler closed early) resolves with an error
+        for task_id, future in self._futures.items():
+            if not future.done():
+                future.set_exception(RuntimeError(f"Subtask {task_id} was not run"))
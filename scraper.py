@@ -0,0 +1,385 @@
+"""
+Built-in, in-process scraping tool.
+
+Reads static pages without the extra hop to the scraping MCP server:
+- one pooled HTTP/2 client (httpx) per process,
+- conditional requests (ETag / Last-Modified) against an in-memory cache,
+- streaming download capped at SCRAPER_MAX_BYTES,
+- a fast standard-library main-content extractor that produces markdown.
+
+Pages that look like they need JavaScript rendering (almost no text but an
+app shell / many scripts) are handed to the MCP scraping tool, if available.
+Works against any URL including a local test server (http://127.0.0.1:...).
+"""
+import os
+import re
+import threading
+from collections import OrderedDict
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+from cassette import get_cassette
+
+# Native scraper configuration via environment variables
+SCRAPER_MAX_BYTES = int(os.environ.get("SCRAPER_MAX_BYTES", str(3 * 1024 * 1024)))
+SCRAPER_TIMEOUT_S = float(os.environ.get("SCRAPER_TIMEOUT_S", "20"))
+SCRAPER_MAX_CONNECTIONS = int(os.environ.get("SCRAPER_MAX_CONNECTIONS", "20"))
+SCRAPER_CACHE_ENTRIES = int(os.environ.get("SCRAPER_CACHE_ENTRIES", "256"))
+# Below this many characters of extracted text a page may need JavaScript
+SCRAPER_MIN_TEXT_CHARS = int(os.environ.get("SCRAPER_MIN_TEXT_CHARS", "200"))
+SCRAPER_USER_AGENT = os.environ.get(
+    "SCRAPER_USER_AGENT", "Mozilla/5.0 (compatible; DeepResearchBot/0.1)"
+)
+
+# Dropped with everything inside them. <form> is not one of them: ASP.NET
+# WebForms pages wrap the whole body in a form, only its controls are skipped.
+SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "canvas", "iframe",
+             "button", "select", "textarea", "nav", "footer", "aside"}
+# Page chrome outside <main>/<article>, but e.g. the title block inside an article
+HEADER_TAG = "header"
+MAIN_TAGS = {"main", "article"}
+BLOCK_TAGS = {"p", "div", "section", "br", "tr", "table", "ul", "ol", "dl", "blockquote",
+              "figure", "figcaption", "dd", "dt", "hr"}
+VOID_TAGS = {"br", "hr", "img", "input", "meta", "link", "area", "base", "col", "embed",
+             "source", "track", "wbr"}
+APP_SHELL = re.compile(r'<div[^>]+id=["\'](?:root|app|__next|__nuxt)["\']', re.I)
+
+
+class _MarkdownExtractor(HTMLParser):
+    """
+    Single-pass HTML to markdown converter that keeps the text of the whole
+    body (minus boilerplate) and, separately, of <main>/<article>.
+    """
+
+    def __init__(self, base_url: str):
+        super().__init__(convert_charrefs=True)
+        self.base_url = base_url
+        self.title = ""
+        self.body = []
+        self.main = []
+        self.scripts = 0
+        self._skip = 0
+        self._main = 0
+        self._pre = 0
+        self._in_title = False
+        self._links = []  # stack of hrefs of open <a> tags
+        self._headers = []  # stack of "skipped" flags of open <header> tags
+
+    def _emit(self, text: str):
+        self.body.append(text)
+        if self._main:
+            self.main.append(text)
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "script":
+            self.scripts += 1
+        if tag == HEADER_TAG:
+            skipped = not self._skip and not self._main
+            self._headers.append(skipped)
+            self._skip += skipped
+            return
+        if tag in SKIP_TAGS:
+            if tag not in VOID_TAGS:
+                self._skip += 1
+            return
+        if tag == "title":
+            # The document title only, not e.g. <svg><title> icon labels
+            self._in_title = not self._skip and not self.title
+        if self._skip:
+            return
+        if tag in MAIN_TAGS:
+            self._main += 1
+
+        if re.fullmatch(r"h[1-6]", tag):
+            self._emit("\n\n" + "#" * int(tag[1]) + " ")
+        elif tag == "li":
+            self._emit("\n- ")
+        elif tag == "pre":
+            self._pre += 1
+            self._emit("\n\n```\n")
+        elif tag in ("strong", "b"):
+            self._emit("**")
+        elif tag in ("em", "i"):
+            self._emit("_")
+        elif tag in ("td", "th"):
+            self._emit(" | ")
+        elif tag == "a":
+            href = dict(attrs).get("href") or ""
+            self._links.append(href)
+            self._emit("[")
+        elif tag in BLOCK_TAGS:
+            self._emit("\n\n" if tag == "p" else "\n")
+
+    def handle_endtag(self, tag):
+        if tag == HEADER_TAG:
+            if self._headers and self._headers.pop():
+                self._skip = max(self._skip - 1, 0)
+            return
+        if tag in SKIP_TAGS:
+            self._skip = max(self._skip - 1, 0)
+            return
+        if tag == "title":
+            self._in_title = False
+        if self._skip:
+            return
+
+        if re.fullmatch(r"h[1-6]", tag) or tag == "p":
+            self._emit("\n\n")
+        elif tag == "pre":
+            self._pre = max(self._pre - 1, 0)
+            self._emit("\n```\n\n")
+        elif tag in ("strong", "b"):
+            self._emit("**")
+        elif tag in ("em", "i"):
+            self._emit("_")
+        elif tag == "a" and self._links:
+            href = self._links.pop()
+            if href and not href.startswith(("#", "javascript:", "mailto:")):
+                self._emit(f"]({urljoin(self.base_url, href)})")
+            else:
+                self._emit("]")
+        elif tag in BLOCK_TAGS:
+            self._emit("\n")
+
+        if tag in MAIN_TAGS and self._main:
+            self._main -= 1
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+            return
+        if self._skip:
+            return
+        if not self._pre:
+            data = re.sub(r"\s+", " ", data)
+        self._emit(data)
+
+
+def _clean_markdown(parts: list) -> str:
+    # Odd segments are inside ``` fences and keep their whitespace
+    segments = "".join(parts).split("```")
+    for i in range(0, len(segments), 2):
+        text = segments[i]
+        text = re.sub(r"\[\s*\]\([^)]*\)", "", text)  # links without text
+        text = re.sub(r"\*\*\s*\*\*|(?<!\w)_\s*_(?!\w)", "", text)  # empty emphasis
+        text = re.sub(r"[ \t]+\n", "\n", text)
+        text = re.sub(r"\n[ \t]+", "\n", text)
+        segments[i] = re.sub(r"\n{3,}", "\n\n", text)
+    return "```".join(segments).strip()
+
+
+def html_to_markdown(html: str, base_url: str = "") -> dict:
+    """
+    Extract the main content of an HTML page as markdown.
+
+    Returns:
+        Dict with title, markdown, text_chars and scripts (number of <script> tags)
+    """
+    parser = _MarkdownExtractor(base_url)
+    parser.feed(html)
+    parser.close()
+
+    main = _clean_markdown(parser.main)
+    body = _clean_markdown(parser.body)
+    # Prefer <main>/<article> unless it is clearly not the page content
+    markdown = main if len(main) >= max(SCRAPER_MIN_TEXT_CHARS, len(body) // 4) else body
+    title = " ".join(parser.title.split())
+    return {
+        "title": title,
+        "markdown": markdown,
+        "text_chars": len(re.sub(r"\s+", "", markdown)),
+        "scripts": parser.scripts,
+    }
+
+
+def needs_javascript(html: str, extracted: dict) -> bool:
+    """
+    Heuristic: no text at all, or little text but an app shell, many scripts
+    or a <noscript> warning.
+    """
+    if extracted["text_chars"] == 0:
+        return True
+    if extracted["text_chars"] >= SCRAPER_MIN_TEXT_CHARS:
+        return False
+    lowered = html.lower()
+    return bool(
+        APP_SHELL.search(html)
+        or extracted["scripts"] >= 3
+        or ("<noscript" in lowered and "javascript" in lowered)
+    )
+
+
+# ---- HTTP ----------------------------------------------------------------------------
+_client = None
+_client_lock = threading.Lock()
+_cache = OrderedDict()  # url -> {"etag", "last_modified", "result"}
+_cache_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Process-wide pooled httpx client (HTTP/2 when the `h2` package is installed).
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            import httpx
+
+            try:
+                import h2  # noqa: F401
+                http2 = True
+            except ImportError:
+                http2 = False
+            _client = httpx.Client(
+                http2=http2,
+                follow_redirects=True,
+                timeout=SCRAPER_TIMEOUT_S,
+                limits=httpx.Limits(
+                    max_connections=SCRAPER_MAX_CONNECTIONS,
+                    max_keepalive_connections=SCRAPER_MAX_CONNECTIONS,
+                ),
+                headers={
+                    "User-Agent": SCRAPER_USER_AGENT,
+                    "Accept": "text/html,application/xhtml+xml,text/plain;q=0.9,*/*;q=0.5",
+                },
+            )
+        return _client
+
+
+def _download(url: str, client, max_bytes: int) -> dict:
+    """
+    GET `url` with conditional headers from the cache, streaming at most `max_bytes`.
+    """
+    with _cache_lock:
+        cached = _cache.get(url)
+    headers = {}
+    if cached:
+        if cached["etag"]:
+            headers["If-None-Match"] = cached["etag"]
+        if cached["last_modified"]:
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    with client.stream("GET", url, headers=headers) as response:
+        if response.status_code == 304:
+            return {"status": 304, "url": str(response.url)}
+        body, truncated = bytearray(), False
+        for chunk in response.iter_bytes():
+            body += chunk
+            if len(body) > max_bytes:
+                del body[max_bytes:]
+                truncated = True
+                break
+        encoding = response.encoding or "utf-8"
+        return {
+            "status": response.status_code,
+            "url": str(response.url),
+            "content_type": response.headers.get("content-type", ""),
+            "etag": response.headers.get("etag"),
+            "last_modified": response.headers.get("last-modified"),
+            "text": body.decode(encoding, errors="replace"),
+            "truncated": truncated,
+        }
+
+
+def scrape_url(url: str, client=None, max_bytes: int = SCRAPER_MAX_BYTES) -> dict:
+    """
+    Fetch a page and extract its main content.
+
+    Returns:
+        Dict with url, status, title, markdown, truncated, from_cache and
+        needs_javascript (True when the page should be rendered by a browser:
+        JavaScript app shells, empty extractions and non-text files)
+    """
+    client = client or get_client()
+    # Goes through the record/replay cassette (a plain call when it is off)
+    response = get_cassette().call(
+        "http", {"url": url}, lambda: _download(url, client, max_bytes), scope="native_scraper"
+    )
+
+    if response["status"] == 304:
+        with _cache_lock:
+            cached = _cache.get(url)
+            if cached is not None:
+                _cache.move_to_end(url)
+                return {**cached["result"], "from_cache": True}
+        # Evicted in the meantime: fetch unconditionally
+        with _cache_lock:
+            _cache.pop(url, None)
+        return scrape_url(url, client, max_bytes)
+
+    if response["status"] >= 400:
+        return {"url": response["url"], "status": response["status"], "title": "",
+                "markdown": "", "truncated": False, "from_cache": False, "needs_javascript": False}
+
+    content_type = response["content_type"].lower()
+    if "html" in content_type or not content_type:
+        extracted = html_to_markdown(response["text"], response["url"])
+        js = needs_javascript(response["text"], extracted)
+    elif content_type.startswith("text/") or "json" in content_type or "xml" in content_type:
+        extracted = {"title": "", "markdown": response["text"]}
+        js = not response["text"].strip()
+    else:
+        # PDFs, images, ...: leave to the MCP scraper
+        extracted = {"title": "", "markdown": ""}
+        js = True
+
+    result = {
+        "url": response["url"],
+        "status": response["status"],
+        "title": extracted["title"],
+        "markdown": extracted["markdown"],
+        "truncated": response["truncated"],
+        "from_cache": False,
+        "needs_javascript": js,
+    }
+    if response.get("etag") or response.get("last_modified"):
+        with _cache_lock:
+            _cache[url] = {"etag": response["etag"], "last_modified": response["last_modified"],
+                           "result": result}
+            _cache.move_to_end(url)
+            while len(_cache) > SCRAPER_CACHE_ENTRIES:
+                _cache.popitem(last=False)
+    return result
+
+
+def format_page(result: dict) -> str:
+    header = f"# {result['title']}\n\nSource: {result['url']}" if result["title"] else f"Source: {result['url']}"
+    note = f"\n\n(Content truncated at {SCRAPER_MAX_BYTES} bytes.)" if result["truncated"] else ""
+    return f"{header}\n\n{result['markdown']}{note}"
+
+
+def build_native_scrape_tool(fallback_tool=None):
+    """
+    Return the `scrape_page` smolagents tool. Pages that need JavaScript (or
+    cannot be fetched) go to `fallback_tool` (the MCP scraping tool) if given.
+    """
+    from smolagents import tool
+
+    @tool
+    def scrape_page(url: str) -> str:
+        """
+        Read a web page and return its main content as markdown.
+
+        Args:
+            url (str): The URL of the page to read.
+
+        Returns:
+            str: The page title, source URL and main content in markdown.
+        """
+        print(f"Scraping (native): {url}")
+        try:
+            result = scrape_url(url)
+        except Exception as e:
+            if fallback_tool is None:
+                return f"Error fetching {url}: {type(e).__name__}: {e}"
+            print(f"Native scrape failed ({e}), falling back to {fallback_tool.name}")
+            return fallback_tool(url=url)
+
+        if result["needs_javascript"] and fallback_tool is not None:
+            print(f"Page needs JavaScript rendering, falling back to {fallback_tool.name}")
+            return fallback_tool(url=url)
+        if result["status"] >= 400:
+            return f"Error fetching {url}: HTTP {result['status']}"
+        return format_page(result)
+
+    return scrape_page
@@ -0,0 +1,258 @@
+"""
+Bounded conversation memory for research sub-agents.
+
+A smolagents agent replays every previous step (model output, tool calls and
+observations) in the prompt of the next step. Sub-agents read search JSON and
+whole scraped pages, so without a policy the prompt grows with every step and
+the total tokens sent grow roughly quadratically with the number of steps.
+
+SubagentMemoryPolicy is registered as a step callback and, after each step:
+1. keeps the last `window` steps verbatim (sliding window),
+2. replaces older observations with a short summary plus a reference that the
+   sub-agent can expand again with the `recall_observation` tool,
+3. enforces a hard cap on the estimated prompt size by compacting further,
+   oldest steps first, and finally by truncating the latest observation (its
+   full text stays available through `recall_observation`).
+
+A task that alone takes more than half of the cap (e.g. long upstream reports)
+is cut in the middle, keeping the query, plan and instructions; the full task
+is available as `recall_observation("task")`. If the system prompt alone
+exceeds the cap, the overrun is logged and counted, and the sub-agent goes on.
+"""
+import json
+import os
+import threading
+
+# Memory policy configured via environment variables
+SUBAGENT_MEMORY_WINDOW = int(os.environ.get("SUBAGENT_MEMORY_WINDOW", "3"))
+SUBAGENT_OBSERVATION_SUMMARY_CHARS = int(os.environ.get("SUBAGENT_OBSERVATION_SUMMARY_CHARS", "400"))
+# 0 disables the hard cap
+SUBAGENT_MAX_PROMPT_TOKENS = int(os.environ.get("SUBAGENT_MAX_PROMPT_TOKENS", "24000"))
+
+# Rough chars-per-token ratio used for prompt size estimates
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def summarize_observation(observation: str, max_chars: int) -> str:
+    """
+    Build a short, deterministic summary of a tool observation.
+
+    Search results (a JSON list of {title, link, ...}) are reduced to their
+    titles and links; anything else is whitespace-collapsed and truncated.
+    """
+    try:
+        data = json.loads(observation)
+    except (TypeError, ValueError):
+        data = None
+
+    if isinstance(data, list) and data and all(isinstance(r, dict) for r in data):
+        lines = [f"- {r.get('title', '')} ({r.get('link', '')})" for r in data]
+        summary = "\n".join(lines)
+    else:
+        summary = " ".join(str(observation).split())
+
+    if len(summary) > max_chars:
+        summary = summary[:max_chars].rstrip() + " ..."
+    return summary
+
+
+def _step_text(step) -> str:
+    parts = [
+        getattr(step, "task", None),
+        getattr(step, "model_output", None),
+        getattr(step, "observations", None),
+    ]
+    for tool_call in getattr(step, "tool_calls", None) or []:
+        parts.append(str(getattr(tool_call, "arguments", "")))
+    error = getattr(step, "error", None)
+    if error is not None:
+        parts.append(str(error))
+    return "\n".join(p for p in parts if isinstance(p, str))
+
+
+def _is_action_step(step) -> bool:
+    return hasattr(step, "observations") and hasattr(step, "step_number")
+
+
+class SubagentMemoryPolicy:
+    """
+    Step callback that bounds the prompt of a single sub-agent.
+
+    Use one instance per sub-agent:
+
+        policy = SubagentMemoryPolicy()
+        agent = ToolCallingAgent(tools=tools + [policy.recall_tool()], ..., step_callbacks=[policy])
+    """
+
+    def __init__(
+        self,
+        window: int = SUBAGENT_MEMORY_WINDOW,
+        summary_chars: int = SUBAGENT_OBSERVATION_SUMMARY_CHARS,
+        max_prompt_tokens: int = SUBAGENT_MAX_PROMPT_TOKENS,
+    ):
+        self.window = max(window, 0)
+        self.summary_chars = summary_chars
+        self.max_prompt_tokens = max_prompt_tokens
+        self._archive = {}
+        self._compacted = set()
+        self._truncated = set()
+        self.task_truncated = False
+        self.cap_overruns = 0
+        self._lock = threading.Lock()
+        self.prompt_tokens_per_step = []
+        self.recalls = 0
+
+    # ---- smolagents step callback ------------------------------------------
+    def __call__(self, memory_step, agent=None):
+        if agent is None or not _is_action_step(memory_step):
+            return
+        self.apply(agent.memory)
+
+    def apply(self, memory) -> int:
+        """
+        Compact `memory` in place and return the estimated next-prompt size in tokens.
+        """
+        with self._lock:
+            steps = [s for s in memory.steps if _is_action_step(s)]
+            if self.max_prompt_tokens:
+                self._trim_task(memory, self.max_prompt_tokens // 2)
+
+            # 1) Sliding window: summarize everything older than the last `window` steps
+            older = steps[: max(len(steps) - self.window, 0)]
+            for step in older:
+                self._compact(step, self.summary_chars)
+
+            # 2) Hard cap: drop summaries down to bare references, oldest first
+            tokens = self._prompt_tokens(memory)
+            if self.max_prompt_tokens:
+                for step in steps[:-1]:
+                    if tokens <= self.max_prompt_tokens:
+                        break
+                    before = estimate_tokens(_step_text(step))
+                    self._compact(step, 0)
+                    tokens -= before - estimate_tokens(_step_text(step))
+
+            # 3) Still over the cap: cut the latest step down to what is left
+            if self.max_prompt_tokens and tokens > self.max_prompt_tokens and steps:
+                self._truncate(steps[-1], tokens - self.max_prompt_tokens)
+                tokens = self._prompt_tokens(memory)
+                if tokens > self.max_prompt_tokens:
+                    self.cap_overruns += 1
+                    print(f"Sub-agent prompt over the cap: {tokens} > {self.max_prompt_tokens} tokens "
+                          f"after compaction (system prompt too long)")
+
+            self.prompt_tokens_per_step.append(tokens)
+            return tokens
+
+    def _compact(self, step, summary_chars: int):
+        ref = f"step-{step.step_number}"
+        observation = step.observations
+        if observation and ref not in self._archive:
+            self._archive[ref] = observation
+        full = self._archive.get(ref)
+        if full is None:
+            return
+
+        header = f"[Observation {ref} compacted from {len(full)} chars; use recall_observation(\"{ref}\") for the full text]"
+        summary = summarize_observation(full, summary_chars) if summary_chars else ""
+        step.observations = f"{header}\n{summary}" if summary else header
+        if summary_chars == 0 and step.model_output and len(step.model_output) > self.summary_chars:
+            step.model_output = step.model_output[: self.summary_chars].rstrip() + " ..."
+        self._compacted.add(ref)
+
+    def _truncate(self, step, excess_tokens: int):
+        """
+        Shorten the observation (and if needed the model output) of `step` by
+        at least `excess_tokens`, archiving the full observation.
+        """
+        ref = f"step-{step.step_number}"
+        excess_chars = (excess_tokens + 2) * CHARS_PER_TOKEN
+        observation = step.observations or ""
+        if observation:
+            full = self._archive.setdefault(ref, observation)
+            header = (f"[Observation {ref} truncated from {len(full)} chars; "
+                      f"use recall_observation(\"{ref}\") for the full text]\n")
+            keep = max(len(observation) - excess_chars - len(header), 0)
+            step.observations = header + observation[:keep]
+            excess_chars -= len(observation) - len(step.observations)
+            self._truncated.add(ref)
+        if excess_chars > 0 and step.model_output:
+            keep = max(len(step.model_output) - excess_chars - 4, 0)
+            step.model_output = step.model_output[:keep] + " ..."
+
+    def _trim_task(self, memory, max_tokens: int):
+        """
+        Cut the middle of the task (where upstream reports go) so that the system
+        prompt and the task fit in `max_tokens`, archiving the full task.
+        """
+        task_step = next((s for s in memory.steps if isinstance(getattr(s, "task", None), str)), None)
+        if task_step is None:
+            return
+        system_prompt = getattr(getattr(memory, "system_prompt", None), "system_prompt", "")
+        budget_chars = (max_tokens - estimate_tokens(system_prompt)) * CHARS_PER_TOKEN
+        task = task_step.task
+        if len(task) <= budget_chars:
+            return
+
+        full = self._archive.setdefault("task", task)
+        marker = (f"\n\n[... {len(full)}-char task cut to fit the prompt; "
+                  f"use recall_observation(\"task\") for the full text ...]\n\n")
+        keep = max(budget_chars - len(marker), 0)
+        head, tail = keep // 2, keep - keep // 2
+        task_step.task = task[:head] + marker + (task[-tail:] if tail else "")
+        self.task_truncated = True
+        print(f"Sub-agent task cut from {len(full)} to {len(task_step.task)} chars to fit the prompt cap")
+
+    @staticmethod
+    def _prompt_tokens(memory) -> int:
+        system_prompt = getattr(getattr(memory, "system_prompt", None), "system_prompt", "")
+        return estimate_tokens(system_prompt) + sum(
+            estimate_tokens(_step_text(s)) for s in memory.steps
+        )
+
+    # ---- references --------------------------------------------------------
+    def recall(self, ref: str) -> str:
+        with self._lock:
+            self.recalls += 1
+            return self._archive.get(ref, f"No archived observation named {ref!r}.")
+
+    def recall_tool(self):
+        """
+        Return a smolagents tool that expands a compacted observation reference.
+        """
+        from smolagents import tool
+
+        @tool
+        def recall_observation(ref: str) -> str:
+            """
+            Return the full text of an earlier tool observation that was compacted
+            to save context. Only use it when the summary is not enough.
+
+            Args:
+                ref (str): The reference shown in the compacted observation, e.g. "step-2".
+
+            Returns:
+                str: The original observation text.
+            """
+            return self.recall(ref)
+
+        return recall_observation
+
+    def summary(self) -> dict:
+        tokens = self.prompt_tokens_per_step
+        return {
+            "steps": len(tokens),
+            "compacted_observations": len(self._compacted),
+            "truncated_observations": len(self._truncated),
+            "task_truncated": self.task_truncated,
+            "cap_overruns": self.cap_overruns,
+            "recalls": self.recalls,
+            "max_prompt_tokens": max(tokens, default=0),
+            "total_prompt_tokens": sum(tokens),
+        }
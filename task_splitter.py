@@ -1,10 +1,12 @@
 import os
 import json
+from types import SimpleNamespace
 from typing import List
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 
-from openai import OpenAI
 from prompts import TASK_SPLITTER_SYSTEM_INSTRUCTIONS
+from scheduler import validate_dependency_graph
+from cassette import get_cassette
 
 class Subtask(BaseModel):
     id: str = Field(
@@ -19,6 +21,10 @@ class Subtask(BaseModel):
         ...,
         description="Clear, detailed instructions for the sub-agent that will research this subtask.",
     )
+    depends_on: List[str] = Field(
+        default_factory=list,
+        description="Ids of subtasks whose reports this subtask needs as input. Empty if independent.",
+    )
 
 class SubtaskList(BaseModel):
     subtasks: List[Subtask] = Field(
@@ -26,39 +32,79 @@ class SubtaskList(BaseModel):
         description="List of subtasks that together cover the whole research plan.",
     )
 
+    @model_validator(mode="after")
+    def check_dependencies(self):
+        # Unique ids, known dependencies and no cycles
+        validate_dependency_graph([t.model_dump() for t in self.subtasks])
+        return self
+
 TASK_SPLITTER_JSON_SCHEMA = {
     "name": "subtaskList",
     "schema": SubtaskList.model_json_schema(),
     "strict": True,
 }
 
-def split_into_subtasks(research_plan: str) -> List[dict]:
+def make_ids_unique(subtasks: List[dict]) -> None:
+    """
+    Give every subtask a unique id in place: a missing id becomes the subtask's
+    position, and repeated ids get "-2", "-3", ... suffixes.
+    """
+    seen = set()
+    for n, task in enumerate(subtasks, 1):
+        base = str(task.get('id') or n)
+        task_id, suffix = base, 2
+        while task_id in seen:
+            task_id, suffix = f"{base}-{suffix}", suffix + 1
+        task['id'] = task_id
+        seen.add(task_id)
+
+def split_into_subtasks(research_plan: str, usage=None) -> List[dict]:
 
     TASK_LLM_URL = os.environ.get("TASK_LLM_URL", "https://api.openai.com/v1")
     TASK_MODEL = os.environ.get("TASK_MODEL", "gpt-4o")
-    
+
     print("\nSplitting the research plan into subtasks...")
     print("MODEL: ", TASK_MODEL)
     print("LLM_URL: ", TASK_LLM_URL)
-    
-    client = OpenAI(
-        api_key=os.environ.get("OPENAI_API_KEY"),
-        base_url=TASK_LLM_URL,
-    )
-    
-    try:
+
+    messages = [
+        {"role": "system", "content": TASK_SPLITTER_SYSTEM_INSTRUCTIONS},
+        {"role": "user", "content": research_plan},
+    ]
+
+    def _complete() -> dict:
+        from openai import OpenAI
+
+        client = OpenAI(
+            api_key=os.environ.get("OPENAI_API_KEY"),
+            base_url=TASK_LLM_URL,
+        )
         completion = client.chat.completions.create(
             model=TASK_MODEL,
-            messages=[
-                {"role": "system", "content": TASK_SPLITTER_SYSTEM_INSTRUCTIONS},
-                {"role": "user", "content": research_plan},
-            ],
+            messages=messages,
             response_format={
                 "type": "json_schema",
                 "json_schema": TASK_SPLITTER_JSON_SCHEMA,
             }
         )
-        content = completion.choices[0].message.content
+        token_usage = completion.usage
+        return {
+            "content": completion.choices[0].message.content,
+            "usage": {
+                "prompt_tokens": token_usage.prompt_tokens,
+                "completion_tokens": token_usage.completion_tokens,
+            } if token_usage is not None else None,
+        }
+
+    try:
+        # Goes through the record/replay cassette (a plain call when it is off)
+        result = get_cassette().call(
+            "openai", {"model": TASK_MODEL, "messages": messages}, _complete, scope="task_splitter"
+        )
+        content = result["content"]
+        if usage is not None:
+            token_usage = SimpleNamespace(**result["usage"]) if result["usage"] else None
+            usage.record_openai_usage("task_splitter", "task_splitter", TASK_MODEL, token_usage, content or "")
         if not content:
             raise ValueError("LLM returned empty content")
             
@@ -78,6 +124,16 @@ def split_into_subtasks(research_plan: str) -> List[dict]:
                     subtasks = data['subtasks']
                 else:
                     raise ValueError("No 'subtasks' key in JSON")
+                for task in subtasks:
+                    task.setdefault('depends_on', [])
+                try:
+                    validate_dependency_graph(subtasks)
+                except ValueError as graph_e:
+                    # Better to run everything independently than not at all
+                    print(f"\033[91mIgnoring invalid subtask dependencies: {graph_e}\033[0m")
+                    make_ids_unique(subtasks)
+                    for task in subtasks:
+                        task['depends_on'] = []
             else:
                 raise e
         except Exception as fallback_e:
@@ -87,6 +143,8 @@ def split_into_subtasks(research_plan: str) -> List[dict]:
     print("\033[93mGenerated The Following Subtasks\033[0m")
     for task in subtasks:
       print(f"\033[93m{task['title']}\033[0m")
+      if task.get('depends_on'):
+        print(f"\033[93mDepends on: {', '.join(task['depends_on'])}\033[0m")
       print(f"\033[93m{task['description']}\033[0m")
       print()
     return subtasks
@@ -0,0 +1,54 @@
+"""
+Prefetch byte budget tests with a fake scraping function.
+
+    python -m pytest tests
+"""
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prefetch import Prefetcher  # noqa: E402
+
+
+def make_prefetcher(release: threading.Event, page_bytes: int = 500) -> Prefetcher:
+    def scrape(url, **kwargs):
+        release.wait(5)
+        return "x" * page_bytes
+
+    prefetcher = Prefetcher(top_k=3, max_bytes=3000, max_page_bytes=1000, scrape_args={})
+    prefetcher._scrape = scrape
+    prefetcher._pool = ThreadPoolExecutor(max_workers=4)
+    return prefetcher
+
+
+def links(prefix: str, n: int) -> list:
+    return [{"link": f"https://{prefix}.example.com/{i}"} for i in range(n)]
+
+
+def test_budget_is_reserved_at_schedule_time():
+    release = threading.Event()
+    prefetcher = make_prefetcher(release)
+    prefetcher.schedule(links("a", 3))
+    prefetcher.schedule(links("b", 3))
+    release.set()
+    wait(list(prefetcher._futures.values()))
+
+    assert prefetcher.stats["scheduled"] == 3
+    assert prefetcher.stats["skipped_bytes_budget"] == 3
+    assert prefetcher.stats["bytes"] == 1500 and prefetcher._reserved == 0
+
+
+def test_prefetches_of_a_previous_job_do_not_touch_the_new_budget():
+    release = threading.Event()
+    prefetcher = make_prefetcher(release)
+    prefetcher.schedule(links("a", 3))
+    stale = list(prefetcher._futures.values())
+    prefetcher.reset()
+    release.set()
+    wait(stale)
+
+    assert prefetcher._reserved == 0
+    assert prefetcher.stats["bytes"] == 0 and prefetcher.stats["scheduled"] == 0
@@ -0,0 +1,68 @@
+"""
+Subtask dependency validation and scheduling tests.
+
+    python -m pytest tests
+"""
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scheduler import SubtaskScheduler, validate_dependency_graph  # noqa: E402
+
+
+def subtask(task_id, *depends_on):
+    return {"id": task_id, "title": task_id, "description": task_id, "depends_on": list(depends_on)}
+
+
+@pytest.mark.parametrize("subtasks, message", [
+    ([subtask("A"), subtask("A")], "Duplicate subtask ids"),
+    ([subtask("A", "B"), subtask("B", "C"), subtask("C", "A")], "cycle"),
+    ([subtask("A", "A")], "depends on itself"),
+    ([subtask("A", "X")], "unknown subtask"),
+    ([{"title": "no id", "description": ""}], "without an id"),
+])
+def test_invalid_graphs_raise_value_error(subtasks, message):
+    with pytest.raises(ValueError, match=message):
+        validate_dependency_graph(subtasks)
+
+
+def test_dependents_get_upstream_reports_including_failures():
+    subtasks = [subtask("A"), subtask("B"), subtask("C", "A", "B")]
+    seen = {}
+
+    def run_subtask(task, upstream):
+        seen[task["id"]] = upstream
+        if task["id"] == "B":
+            raise RuntimeError("search quota exceeded")
+        return f"report {task['id']}"
+
+    with SubtaskScheduler(subtasks, run_subtask, max_workers=2) as scheduler:
+        assert scheduler.result("C", timeout=5) == "report C"
+        with pytest.raises(RuntimeError):
+            scheduler.result("B", timeout=5)
+
+    assert seen["A"] == {} and seen["C"]["A"] == "report A"
+    assert "Upstream subtask B failed: search quota exceeded" in seen["C"]["B"]
+
+
+def test_splitter_fallback_makes_ids_unique(monkeypatch):
+    pytest.importorskip("pydantic")
+    import task_splitter
+
+    content = json.dumps({"subtasks": [
+        subtask("A"), subtask("A", "A"), {"title": "T", "description": "D"},
+    ]})
+    cassette = SimpleNamespace(call=lambda *args, **kwargs: {"content": content, "usage": None})
+    monkeypatch.setattr(task_splitter, "get_cassette", lambda: cassette)
+
+    subtasks = task_splitter.split_into_subtasks("plan")
+
+    assert [t["id"] for t in subtasks] == ["A", "A-2", "3"]
+    assert all(t["depends_on"] == [] for t in subtasks)
+    with SubtaskScheduler(subtasks, lambda task, upstream: task["id"]) as scheduler:
+        assert scheduler.result("A-2", timeout=5) == "A-2"
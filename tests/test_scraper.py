@@ -0,0 +1,149 @@
+"""
+Native scraper tests against a local HTTP server fixture.
+
+    python -m pytest tests
+"""
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+httpx = pytest.importorskip("httpx")
+
+import scraper  # noqa: E402
+
+ARTICLE = (
+    "<html><head><title>Annual Report</title></head><body>"
+    "<header><a href='/'>Home</a></header><nav><a href='/a'>A</a></nav>"
+    "<main><article><header><h1>Annual Report 2024</h1></header>"
+    "<p>The agency published <b>new figures</b> on <a href='/data'>the data page</a>.</p>"
+    + "<p>Details of the programme and its budget.</p>" * 10
+    + "</article></main><footer>Contact</footer></body></html>"
+)
+WEBFORMS = (
+    "<html><body><form method='post' id='aspnetForm'><input type='hidden' name='__VIEWSTATE'>"
+    "<div id='content'><h1>Notice of Rulemaking</h1>"
+    + "<p>The department proposes to amend the regulation.</p>" * 8
+    + "</div><button>Search</button></form></body></html>"
+)
+APP_SHELL = (
+    "<html><head><script src='/a.js'></script><script src='/b.js'></script></head>"
+    "<body><div id='root'></div><script src='/c.js'></script></body></html>"
+)
+ETAG = '"v1"'
+
+
+class Handler(BaseHTTPRequestHandler):
+    requests = []
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=b"", content_type="text/html; charset=utf-8", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        Handler.requests.append((self.path, self.headers.get("If-None-Match")))
+        if self.path == "/article":
+            if self.headers.get("If-None-Match") == ETAG:
+                self.send_response(304)
+                self.send_header("ETag", ETAG)
+                self.end_headers()
+                return
+            self._send(200, ARTICLE.encode(), headers={"ETag": ETAG})
+        elif self.path == "/webforms":
+            self._send(200, WEBFORMS.encode())
+        elif self.path == "/big":
+            self._send(200, ("<p>" + "x" * 100 + "</p>").encode() * 2000)
+        elif self.path == "/app":
+            self._send(200, APP_SHELL.encode())
+        elif self.path == "/report.pdf":
+            self._send(200, b"%PDF-1.4 ...", content_type="application/pdf")
+        else:
+            self._send(404)
+
+
+@pytest.fixture(scope="module")
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+
+
+@pytest.fixture
+def client():
+    scraper._cache.clear()
+    Handler.requests.clear()
+    with httpx.Client() as c:
+        yield c
+
+
+def test_extracts_main_content(server, client):
+    result = scraper.scrape_url(f"{server}/article", client)
+
+    assert result["status"] == 200
+    assert result["title"] == "Annual Report"
+    assert result["markdown"].startswith("# Annual Report 2024")
+    assert f"[the data page]({server}/data)" in result["markdown"]
+    assert "**new figures**" in result["markdown"]
+    assert "Home" not in result["markdown"] and "Contact" not in result["markdown"]
+    assert not result["needs_javascript"]
+
+
+def test_revalidates_with_etag(server, client):
+    first = scraper.scrape_url(f"{server}/article", client)
+    second = scraper.scrape_url(f"{server}/article", client)
+
+    assert Handler.requests == [("/article", None), ("/article", ETAG)]
+    assert not first["from_cache"] and second["from_cache"]
+    assert second["markdown"] == first["markdown"]
+
+
+def test_truncates_at_max_bytes(server, client):
+    result = scraper.scrape_url(f"{server}/big", client, max_bytes=10_000)
+
+    assert result["truncated"]
+    assert len(result["markdown"]) < 10_000
+    assert not scraper.scrape_url(f"{server}/article", client, max_bytes=10_000)["truncated"]
+
+
+def test_keeps_webforms_body(server, client):
+    result = scraper.scrape_url(f"{server}/webforms", client)
+
+    assert result["markdown"].startswith("# Notice of Rulemaking")
+    assert "Search" not in result["markdown"]
+    assert not result["needs_javascript"]
+
+
+def test_app_shell_and_non_html_need_fallback(server, client):
+    assert scraper.scrape_url(f"{server}/app", client)["needs_javascript"]
+    assert scraper.scrape_url(f"{server}/report.pdf", client)["needs_javascript"]
+
+
+def test_empty_extraction_needs_fallback():
+    extracted = scraper.html_to_markdown("<html><body><nav>Menu</nav></body></html>")
+
+    assert extracted["markdown"] == ""
+    assert scraper.needs_javascript("<html></html>", extracted)
+
+
+def test_title_ignores_inline_svg_titles():
+    extracted = scraper.html_to_markdown(
+        "<html><head><title>Real</title></head><body><main>"
+        "<button><svg><title>Close icon</title></svg></button><svg><title>Logo</title></svg>"
+        "<p>Body text.</p></main></body></html>"
+    )
+
+    assert extracted["title"] == "Real"
+    assert "icon" not in extracted["markdown"] and "Logo" not in extracted["markdown"]
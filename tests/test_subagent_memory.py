@@ -0,0 +1,63 @@
+"""
+Sub-agent memory policy tests on a synthetic agent memory.
+
+    python -m pytest tests
+"""
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from subagent_memory import SubagentMemoryPolicy  # noqa: E402
+
+
+def make_memory(task: str, system_prompt: str = "x" * 8000):
+    return SimpleNamespace(
+        system_prompt=SimpleNamespace(system_prompt=system_prompt),
+        steps=[SimpleNamespace(task=task)],
+    )
+
+
+def add_step(memory, n: int, observation: str):
+    memory.steps.append(SimpleNamespace(
+        step_number=n, model_output="Reading the next source. " * 10,
+        tool_calls=[], observations=observation, error=None,
+    ))
+
+
+def test_prompt_stays_under_cap_and_observations_are_recallable():
+    policy = SubagentMemoryPolicy(window=2, max_prompt_tokens=24000)
+    memory = make_memory("Research the subtask.")
+    pages = [f"page {n} " + "lorem ipsum " * 20000 for n in range(1, 5)]
+    for n, page in enumerate(pages, 1):
+        add_step(memory, n, page)
+        assert policy.apply(memory) <= 24000
+
+    assert policy.recall("step-1") == pages[0]
+    assert policy.recall("step-4") == pages[3]
+    assert policy.summary()["truncated_observations"] >= 1
+
+
+def test_long_task_is_cut_in_the_middle_instead_of_failing():
+    task = "QUERY " + "upstream report " * 7000 + " INSTRUCTIONS"
+    policy = SubagentMemoryPolicy(max_prompt_tokens=24000)
+    memory = make_memory(task)
+    for n in range(1, 4):
+        add_step(memory, n, "search results " * 1000)
+        assert policy.apply(memory) <= 24000
+
+    trimmed = memory.steps[0].task
+    assert trimmed.startswith("QUERY") and trimmed.endswith("INSTRUCTIONS")
+    assert 'recall_observation("task")' in trimmed
+    assert policy.recall("task") == task
+    assert policy.summary()["task_truncated"] and policy.summary()["cap_overruns"] == 0
+
+
+def test_oversized_system_prompt_is_counted_not_raised():
+    policy = SubagentMemoryPolicy(max_prompt_tokens=1000)
+    memory = make_memory("Research the subtask.", system_prompt="x" * 8000)
+    add_step(memory, 1, "search results")
+
+    assert policy.apply(memory) > 1000
+    assert policy.summary()["cap_overruns"] == 1
@@ -0,0 +1,32 @@
+"""
+Usage tracker budget tests.
+
+    python -m pytest tests
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from usage import UsageTracker  # noqa: E402
+
+PRICES = {"model": {"input": 1.0, "output": 1.0}}
+
+
+def test_concurrent_jobs_share_the_remaining_budget():
+    usage = UsageTracker(prices=PRICES, budget_usd=4.0, budget_tokens=4_000_000)
+    shares = [usage.reserve_budget(parts) for parts in (4, 3, 2, 1)]
+
+    assert sum(s["usd"] for s in shares) <= 4.0
+    assert sum(s["tokens"] for s in shares) <= 4_000_000
+
+    for share in shares:
+        usage.release_budget(share)
+    usage.record("subagent", "subagent_A", "model", 1_000_000, 0)
+    assert usage.reserve_budget() == {"usd": 3.0, "tokens": 3_000_000}
+
+
+def test_unlimited_budget_reserves_nothing():
+    usage = UsageTracker(prices=PRICES, budget_usd=0, budget_tokens=0)
+
+    assert usage.reserve_budget(4) == {"usd": 0, "tokens": 0}
@@ -0,0 +1,317 @@
+"""
+Token and cost accounting for a research run, with an optional run budget.
+
+Every LLM call (planner, task splitter, coordinator and sub-agent steps) is
+recorded by stage, agent and model. Costs come from a per-model price table
+(USD per 1M tokens). When a run budget is configured the tracker reports a
+budget level that the pipeline uses to degrade gracefully:
+
+- "soft":      spend passed RUN_BUDGET_SOFT_RATIO of the budget; new sub-agents
+               use the cheaper BUDGET_FALLBACK_MODEL (if configured)
+- "exhausted": subtasks that have not started are skipped, and running agents
+               are interrupted and forced to give their final answer
+
+Models missing from the price table cost $0, so with a USD budget the run warns
+about them at start (check_prices). Jobs delegated to queue workers get a
+reserved share of the remaining budget (reserve_budget / release_budget).
+"""
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+# Price table (USD per 1M tokens) as JSON, inline or in a file:
+#   {"gpt-4o": {"input": 2.5, "output": 10.0}}
+MODEL_PRICES = os.environ.get("MODEL_PRICES")
+MODEL_PRICES_FILE = os.environ.get("MODEL_PRICES_FILE")
+
+# Run budget; 0 disables the corresponding limit
+RUN_BUDGET_USD = float(os.environ.get("RUN_BUDGET_USD", "0"))
+RUN_BUDGET_TOKENS = int(os.environ.get("RUN_BUDGET_TOKENS", "0"))
+RUN_BUDGET_SOFT_RATIO = float(os.environ.get("RUN_BUDGET_SOFT_RATIO", "0.8"))
+
+DEFAULT_MODEL_PRICES = {
+    "gpt-4o": {"input": 2.5, "output": 10.0},
+    "gpt-4o-mini": {"input": 0.15, "output": 0.6},
+    "gpt-4.1": {"input": 2.0, "output": 8.0},
+    "gpt-4.1-mini": {"input": 0.4, "output": 1.6},
+}
+
+BUDGET_OK = "ok"
+BUDGET_SOFT = "soft"
+BUDGET_EXHAUSTED = "exhausted"
+
+
+def load_price_table() -> dict:
+    """
+    Default prices, overridden by MODEL_PRICES_FILE and then MODEL_PRICES.
+    """
+    prices = dict(DEFAULT_MODEL_PRICES)
+    if MODEL_PRICES_FILE:
+        with open(MODEL_PRICES_FILE) as f:
+            prices.update(json.load(f))
+    if MODEL_PRICES:
+        prices.update(json.loads(MODEL_PRICES))
+    return prices
+
+
+def normalize_model_id(model_id: str) -> str:
+    # LiteLLM ids carry a provider prefix ("openai/gpt-4o")
+    if model_id and model_id.startswith("openai/"):
+        return model_id[len("openai/"):]
+    return model_id or "unknown"
+
+
+def _totals():
+    return {"calls": 0, "input_tokens": 0, "output_tokens": 0, "cost_usd": 0.0}
+
+
+class UsageTracker:
+    """
+    Thread-safe accumulator of LLM usage for one research run.
+    """
+
+    def __init__(
+        self,
+        prices: dict = None,
+        budget_usd: float = RUN_BUDGET_USD,
+        budget_tokens: int = RUN_BUDGET_TOKENS,
+        soft_ratio: float = RUN_BUDGET_SOFT_RATIO,
+    ):
+        self.prices = prices if prices is not None else load_price_table()
+        self.budget_usd = budget_usd
+        self.budget_tokens = budget_tokens
+        self.soft_ratio = soft_ratio
+        self.started_at = time.time()
+        self.calls = []
+        self.events = []
+        self.unpriced_models = set()
+        self._interrupted = set()
+        self._reserved = {"usd": 0, "tokens": 0}  # shares of delegated jobs still running
+        self._lock = threading.Lock()
+
+    # ---- recording -----------------------------------------------------------
+    def cost(self, model: str, input_tokens: int, output_tokens: int) -> float:
+        price = self.prices.get(model)
+        if price is None:
+            self.unpriced_models.add(model)
+            return 0.0
+        return (input_tokens * price["input"] + output_tokens * price["output"]) / 1_000_000
+
+    def record(self, stage: str, agent: str, model: str, input_tokens: int, output_tokens: int,
+               estimated: bool = False, tier: str = None, latency_s: float = None, escalated: str = None):
+        """
+        Record one LLM call. Calls made through a model cascade (cascade.py) also
+        carry their tier, latency and, for discarded outputs, the escalation reason.
+        """
+        model = normalize_model_id(model)
+        input_tokens, output_tokens = int(input_tokens or 0), int(output_tokens or 0)
+        with self._lock:
+            self.calls.append({
+                "stage": stage,
+                "agent": agent,
+                "model": model,
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "cost_usd": self.cost(model, input_tokens, output_tokens),
+                "estimated": estimated,
+                "tier": tier,
+                "latency_s": round(latency_s, 4) if latency_s is not None else None,
+                "escalated": escalated,
+            })
+
+    def record_openai_usage(self, stage: str, agent: str, model: str, usage, fallback_text: str = ""):
+        """
+        Record an OpenAI `CompletionUsage`; estimate from the output text if missing.
+        """
+        if usage is not None:
+            self.record(stage, agent, model, usage.prompt_tokens, usage.completion_tokens)
+        else:
+            self.record(stage, agent, model, 0, len(fallback_text) // 4, estimated=True)
+
+    def record_chat_message(self, stage: str, agent: str, model: str, message):
+        token_usage = getattr(message, "token_usage", None)
+        if token_usage is not None:
+            self.record(stage, agent, model, token_usage.input_tokens, token_usage.output_tokens)
+
+    def step_callback(self, stage: str, model: str, record: bool = True):
+        """
+        Return a smolagents step callback that records each step's token usage
+        (unless the model records its own calls, see cascade.py) and interrupts
+        the agent once the run budget is exhausted.
+        """
+        def callback(memory_step, agent=None):
+            token_usage = getattr(memory_step, "token_usage", None)
+            name = getattr(agent, "name", None) or stage
+            if record and token_usage is not None:
+                self.record(stage, name, model, token_usage.input_tokens, token_usage.output_tokens)
+            if agent is not None and self.budget_level() == BUDGET_EXHAUSTED and name not in self._interrupted:
+                self._interrupted.add(name)
+                self.event(f"budget exhausted: forcing {name} to finalize")
+                agent.interrupt()
+
+        return callback
+
+    def run_agent(self, agent, task: str, stage: str, model: str, record: bool = True) -> str:
+        """
+        Run a smolagents agent; if the budget interrupted it, ask it for its final
+        answer based on what it has gathered so far.
+        """
+        try:
+            return agent.run(task)
+        except Exception:
+            if agent.name not in self._interrupted:
+                raise
+            final = agent.provide_final_answer(task)
+            if record:
+                self.record_chat_message(stage, agent.name, model, final)
+            return getattr(final, "content", final)
+
+    def merge(self, calls: list, events: list = ()):
+        """
+        Add calls and events recorded by another tracker (e.g. in a worker process).
+        """
+        with self._lock:
+            self.calls.extend(calls)
+            self.events.extend(events)
+            for c in calls:
+                if c["model"] not in self.prices:
+                    self.unpriced_models.add(c["model"])
+
+    def event(self, message: str):
+        print(f"\033[91mBudget: {message}\033[0m")
+        with self._lock:
+            self.events.append({"t": round(time.time() - self.started_at, 3), "event": message})
+
+    def check_prices(self, models: dict) -> list:
+        """
+        Warn when a USD budget is set but some configured models ({role: model id})
+        have no price: their calls would count as $0 and never trigger the budget.
+
+        Returns:
+            The unpriced model ids
+        """
+        missing = {}
+        for role, model in models.items():
+            if model and normalize_model_id(model) not in self.prices:
+                missing.setdefault(normalize_model_id(model), []).append(role)
+        if self.budget_usd and missing:
+            listed = ", ".join(f"{m} ({'/'.join(roles)})" for m, roles in missing.items())
+            self.event(f"RUN_BUDGET_USD is set but these models have no price and count as $0: "
+                       f"{listed}; add them to MODEL_PRICES or MODEL_PRICES_FILE")
+        return sorted(missing)
+
+    # ---- totals & budget -----------------------------------------------------
+    @property
+    def total_cost(self) -> float:
+        with self._lock:
+            return sum(c["cost_usd"] for c in self.calls)
+
+    @property
+    def total_tokens(self) -> int:
+        with self._lock:
+            return sum(c["input_tokens"] + c["output_tokens"] for c in self.calls)
+
+    def budget_ratio(self) -> float:
+        """Fraction of the tightest configured budget already spent."""
+        ratios = [0.0]
+        if self.budget_usd:
+            ratios.append(self.total_cost / self.budget_usd)
+        if self.budget_tokens:
+            ratios.append(self.total_tokens / self.budget_tokens)
+        return max(ratios)
+
+    def reserve_budget(self, parts: int = 1) -> dict:
+        """
+        Reserve a 1/`parts` share of the budget neither spent nor reserved for a
+        delegated piece of work (e.g. a queued sub-agent job), so that concurrent
+        jobs cannot together spend more than is left. 0 means unlimited, so an
+        exhausted limit is reported as the smallest positive amount. Give the
+        share back with release_budget() once the job's usage is merged.
+        """
+        spent_usd, spent_tokens = self.total_cost, self.total_tokens
+        parts = max(parts, 1)
+        share = {"usd": 0, "tokens": 0}
+        with self._lock:
+            if self.budget_usd:
+                free = self.budget_usd - spent_usd - self._reserved["usd"]
+                share["usd"] = max(free / parts, 1e-9)
+            if self.budget_tokens:
+                free = self.budget_tokens - spent_tokens - self._reserved["tokens"]
+                share["tokens"] = max(free // parts, 1)
+            for key, value in share.items():
+                self._reserved[key] += value
+        return share
+
+    def release_budget(self, share: dict):
+        with self._lock:
+            for key, value in share.items():
+                self._reserved[key] -= value
+
+    def budget_level(self) -> str:
+        ratio = self.budget_ratio()
+        if ratio >= 1.0:
+            return BUDGET_EXHAUSTED
+        if ratio >= self.soft_ratio:
+            return BUDGET_SOFT
+        return BUDGET_OK
+
+    def summary(self) -> dict:
+        by = {"stage": defaultdict(_totals), "agent": defaultdict(_totals), "model": defaultdict(_totals)}
+        with self._lock:
+            calls = list(self.calls)
+        for c in calls:
+            for key, groups in by.items():
+                g = groups[c[key]]
+                g["calls"] += 1
+                g["input_tokens"] += c["input_tokens"]
+                g["output_tokens"] += c["output_tokens"]
+                g["cost_usd"] += c["cost_usd"]
+
+        total = _totals()
+        for g in by["stage"].values():
+            for k in total:
+                total[k] += g[k]
+
+        by_tier = {}
+        for c in calls:
+            if not c.get("tier"):
+                continue
+            g = by_tier.setdefault(c["tier"], {**_totals(), "latency_s": 0.0, "escalated": 0,
+                                               "escalation_reasons": defaultdict(int)})
+            g["calls"] += 1
+            g["input_tokens"] += c["input_tokens"]
+            g["output_tokens"] += c["output_tokens"]
+            g["cost_usd"] += c["cost_usd"]
+            g["latency_s"] += c["latency_s"] or 0.0
+            if c["escalated"]:
+                g["escalated"] += 1
+                g["escalation_reasons"][c["escalated"]] += 1
+        for g in by_tier.values():
+            g["mean_latency_s"] = round(g["latency_s"] / g["calls"], 3)
+            g["latency_s"] = round(g["latency_s"], 3)
+            g["escalation_reasons"] = dict(g["escalation_reasons"])
+
+        return {
+            "total": total,
+            "by_stage": dict(by["stage"]),
+            "by_agent": dict(by["agent"]),
+            "by_model": dict(by["model"]),
+            "by_tier": by_tier,
+            "budget": {
+                "usd": self.budget_usd,
+                "tokens": self.budget_tokens,
+                "soft_ratio": self.soft_ratio,
+                "ratio_used": round(self.budget_ratio(), 4),
+                "level": self.budget_level(),
+                "events": list(self.events),
+            },
+            "unpriced_models": sorted(self.unpriced_models),
+            "estimated_calls": sum(1 for c in calls if c["estimated"]),
+            "elapsed_s": round(time.time() - self.started_at, 3),
+        }
+
+    def write_summary(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2, ensure_ascii=False)
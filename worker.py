@@ -0,0 +1,26 @@
+"""
+Sub-agent worker process for SUBAGENT_EXECUTION=queue.
+
+Start extra workers (on this or another host) against the dispatcher's broker:
+
+    JOB_QUEUE_AUTHKEY=... python worker.py --broker manager://<dispatcher-host>:<port>
+"""
+import argparse
+
+from dotenv import load_dotenv
+
+# Load environment variables before the modules below read their configuration
+load_dotenv()
+
+from job_queue import JOB_QUEUE_URL, run_worker
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deep research sub-agent worker")
+    parser.add_argument("--broker", default=JOB_QUEUE_URL, help="Broker URL printed by the dispatcher")
+    args = parser.parse_args()
+    run_worker(args.broker)
+
+
+if __name__ == "__main__":
+    main()